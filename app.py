@@ -1,260 +1,457 @@
 # Training Journal - Web Interface
 # Flask application for marathon training tracking
 
-from flask import Flask, render_template, request, redirect, url_for
+from flask import Flask, Response, abort, g, render_template, request, redirect, url_for
+from jinja2 import FileSystemBytecodeCache
+import gzip
+import hashlib
 import json
+import mimetypes
+import os
+import queue
+import threading
 from datetime import datetime, timedelta
 
-app = Flask(__name__)
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+from engine import analytics, anomaly, caches, cube, fitness, profiling, search, store
+from engine.bitmap import BITMAP_FACTORS, CATEGORY_FIELDS
+from engine.weekly import format_pace, get_week_bounds
 
-# File to store data
-DATA_FILE = "training_data.json"
+app = Flask(__name__)
 
 # Your marathon goal
 GOAL = "2:32:00 Boston"
 
+# Days of anomaly alerts shown on the dashboard
+ALERT_DAYS = 14
+
 
 # =============================================================================
 # DATA FUNCTIONS
 # =============================================================================
 
 def load_data():
-    """Load entries from file"""
+    """Load entries from the store (only new journal records are read)"""
+    return store.load_entries()
+
+
+# =============================================================================
+# STATIC ASSETS AND TEMPLATES
+# =============================================================================
+
+# Fingerprinted assets never change under the same URL
+ASSET_MAX_AGE = 365 * 24 * 3600
+
+# Files in static/ by name: content hash, hashed URL name, mtime and the
+# raw / gzip / brotli bodies, built once at startup
+assets = {}
+
+# Hashed URL name -> file name
+asset_names = {}
+
+
+def build_asset(filename):
+    """Hash and pre-compress one file from static/"""
+    path = os.path.join(app.static_folder, filename)
+    with open(path, "rb") as f:
+        raw = f.read()
+
+    digest = hashlib.sha256(raw).hexdigest()[:12]
+    stem, ext = os.path.splitext(filename)
+    asset = {
+        "hash": digest,
+        "name": f"{stem}.{digest}{ext}",
+        "mtime": os.path.getmtime(path),
+        "mimetype": mimetypes.guess_type(filename)[0] or "application/octet-stream",
+        "identity": raw,
+        "gzip": gzip.compress(raw, compresslevel=9, mtime=0),
+    }
+    if brotli is not None:
+        asset["br"] = brotli.compress(raw, quality=11)
+
+    old = assets.get(filename)
+    if old:
+        asset_names.pop(old["name"], None)
+    assets[filename] = asset
+    asset_names[asset["name"]] = filename
+    return asset
+
+
+def build_assets():
+    """Fingerprint and compress everything in static/"""
+    for root, _, files in os.walk(app.static_folder):
+        for name in files:
+            build_asset(os.path.relpath(os.path.join(root, name), app.static_folder).replace(os.sep, "/"))
+
+
+def asset_url(filename):
+    """Content-hashed URL for a static file (use instead of url_for('static'))"""
+    asset = assets.get(filename)
+    if asset is None:
+        return url_for("static", filename=filename)
+    # In debug, pick up edits without a restart
+    if app.debug and os.path.getmtime(os.path.join(app.static_folder, filename)) != asset["mtime"]:
+        asset = build_asset(filename)
+    return url_for("asset", name=asset["name"])
+
+
+def precompile_templates():
+    """Compile every template now, so no request pays for it.
+
+    The bytecode cache lets other workers and later restarts load the
+    compiled templates instead of parsing them again. With no directory
+    given, Jinja uses a per-user temp directory (mode 0700) and refuses
+    one owned by someone else, so nobody else can plant bytecode there.
+    """
     try:
-        with open(DATA_FILE, "r") as f:
-            return json.load(f)
-    except FileNotFoundError:
-        return []
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache()
+    except (OSError, RuntimeError):
+        pass  # no private temp dir: compile in memory only
+    for name in app.jinja_env.list_templates():
+        app.jinja_env.get_template(name)
 
 
-def save_data(entries):
-    """Save entries to file"""
-    with open(DATA_FILE, "w") as f:
-        json.dump(entries, f, indent=2)
+app.jinja_env.globals["asset_url"] = asset_url
 
 
-def get_week_bounds(date_str):
-    """Get Monday and Sunday of the week containing date_str"""
-    date = datetime.strptime(date_str, "%Y-%m-%d")
-    monday = date - timedelta(days=date.weekday())
-    sunday = monday + timedelta(days=6)
-    return monday.strftime("%Y-%m-%d"), sunday.strftime("%Y-%m-%d")
+@app.route("/assets/<path:name>")
+def asset(name):
+    """Serve a fingerprinted asset, pre-compressed when the client accepts it"""
+    filename = asset_names.get(name)
+    if filename is None:
+        abort(404)
+    asset = assets[filename]
 
+    if request.if_none_match.contains(asset["hash"]):
+        response = Response(status=304)
+    else:
+        encoding = "identity"
+        for candidate in ("br", "gzip"):
+            # Quality, not membership: "gzip;q=0" means the client refuses it
+            if candidate in asset and request.accept_encodings[candidate] > 0:
+                encoding = candidate
+                break
+        response = Response(asset[encoding], mimetype=asset["mimetype"])
+        if encoding != "identity":
+            response.headers["Content-Encoding"] = encoding
+
+    response.set_etag(asset["hash"])
+    response.headers["Cache-Control"] = f"public, max-age={ASSET_MAX_AGE}, immutable"
+    response.headers["Vary"] = "Accept-Encoding"
+    return response
 
-def get_last_7_days_entries(entries):
-    """Get entries from the last 7 days"""
-    today = datetime.now()
-    seven_days_ago = (today - timedelta(days=7)).strftime("%Y-%m-%d")
-    today_str = today.strftime("%Y-%m-%d")
-    return [e for e in entries if seven_days_ago <= e.get("date", "") <= today_str]
 
+# =============================================================================
+# PROFILING
+# =============================================================================
 
-def simple_linear_regression(x_values, y_values):
-    """Calculate simple linear regression coefficients and correlation"""
-    n = len(x_values)
-    if n < 3:
-        return None
+# Endpoints left out of per-request profiles (assets, the long-lived feed)
+PROFILE_SKIP = {"asset", "events", "static"}
 
-    # Calculate means
-    x_mean = sum(x_values) / n
-    y_mean = sum(y_values) / n
 
-    # Calculate slope and correlation
-    numerator = sum((x - x_mean) * (y - y_mean) for x, y in zip(x_values, y_values))
-    x_variance = sum((x - x_mean) ** 2 for x in x_values)
-    y_variance = sum((y - y_mean) ** 2 for y in y_values)
+@app.before_request
+def start_profile():
+    """With TRAINING_PROFILE set, profile each request as one scope"""
+    if profiling.enabled and request.endpoint not in PROFILE_SKIP:
+        profiling.start(f"{request.method} {request.full_path.rstrip('?')}")
+        g.profiling = True
 
-    if x_variance == 0 or y_variance == 0:
-        return None
 
-    slope = numerator / x_variance
-    correlation = numerator / (x_variance ** 0.5 * y_variance ** 0.5)
+@app.teardown_request
+def stop_profile(exc):
+    """Print the request's profile report to stderr"""
+    if g.pop("profiling", False):
+        profiling.stop()
 
-    return {
-        "slope": slope,
-        "correlation": correlation,
-        "r_squared": correlation ** 2
+
+# =============================================================================
+# CHANGE FEED
+# =============================================================================
+
+# One queue per open /events stream
+feed_subscribers = []
+
+# Drop a stream whose client has fallen this many messages behind
+FEED_QUEUE_SIZE = 100
+
+# How often an idle stream checks the store for writes from other processes
+FEED_POLL_SECONDS = 5
+
+
+# Changes waiting for the feed worker, see publish_change
+feed_changes = queue.Queue()
+
+# Thread that builds and broadcasts deltas (started with the first stream)
+feed_worker = None
+feed_worker_lock = threading.Lock()
+
+
+def publish_change(op, old, new):
+    """Hand a write to the feed worker.
+
+    Runs inside the store's write lock, so it only queues the change;
+    the dashboard delta is built later on the feed worker.
+    """
+    if feed_subscribers:
+        feed_changes.put((op, old, new))
+
+
+def change_message(op, old, new, dashboard):
+    """SSE message for one change"""
+    if op == "reset":
+        return "event: reset\ndata: {}\n\n"
+
+    changed = new or old
+    monday, sunday = get_week_bounds(changed["date"])
+    delta = {
+        "op": op,
+        "id": changed["id"],
+        "entry": new,
+        "flagged": bool(caches.anomaly_flags(changed["id"])),
+        "week": caches.get_week_stats(monday, sunday),
+        "dashboard": dashboard,
     }
+    return f"event: change\ndata: {json.dumps(delta)}\n\n"
+
+
+def run_feed_worker():
+    """Build deltas for queued changes and push them to every stream.
+
+    Changes that pile up while one batch is being built go out together,
+    sharing one dashboard summary.
+    """
+    while True:
+        changes = [feed_changes.get()]
+        while not feed_changes.empty():
+            changes.append(feed_changes.get_nowait())
+
+        with store._lock:
+            entries = list(store.cache["entries"].values())
+        dashboard = dashboard_summary(entries)
+
+        for op, old, new in changes:
+            message = change_message(op, old, new, dashboard)
+            for feed in list(feed_subscribers):
+                try:
+                    feed.put_nowait(message)
+                except queue.Full:
+                    feed_subscribers.remove(feed)
+
 
+def start_feed_worker():
+    """Start the feed worker once per process (threads don't survive a fork)"""
+    global feed_worker
+    with feed_worker_lock:
+        if feed_worker is None or not feed_worker.is_alive():
+            feed_worker = threading.Thread(target=run_feed_worker, daemon=True)
+            feed_worker.start()
 
-def generate_regression_insight(entries):
-    """Generate key insight using regression analysis on last 7 days data"""
-    recent_entries = get_last_7_days_entries(entries)
-
-    if len(recent_entries) < 3:
-        return None
-
-    # Define factors to analyze against RPE
-    # Each tuple: (factor_key, factor_name, is_boolean, direction_text)
-    factors = [
-        ("sleep", "sleep quality", False, ("improves", "hurts")),
-        ("stress", "stress", False, ("helps", "increases")),
-        ("caffeine", "caffeine", False, ("helps", "increases")),
-        ("alcohol", "alcohol", True, ("lowers", "raises")),
-        ("nicotine", "nicotine", True, ("lowers", "raises")),
-        ("travel", "travel", True, ("helps", "hurts")),
-        ("stretch", "stretching", True, ("helps", "hurts")),
-        ("hrv", "HRV", False, ("correlates with higher", "correlates with lower")),
-        ("rhr", "resting HR", False, ("correlates with lower", "correlates with higher")),
-    ]
-
-    best_insight = None
-    best_r_squared = 0
-
-    # Get entries with RPE data
-    rpe_entries = [e for e in recent_entries if e.get("rpe") is not None]
-    if len(rpe_entries) < 3:
-        return None
-
-    for factor_key, factor_name, is_boolean, direction in factors:
-        # Build x and y arrays
-        x_values = []
-        y_values = []
-
-        for entry in rpe_entries:
-            factor_val = entry.get(factor_key)
-            if factor_val is not None:
-                if is_boolean:
-                    x_values.append(1 if factor_val else 0)
-                else:
-                    x_values.append(float(factor_val))
-                y_values.append(float(entry["rpe"]))
-
-        if len(x_values) < 3:
-            continue
-
-        result = simple_linear_regression(x_values, y_values)
-        if result and result["r_squared"] > best_r_squared and result["r_squared"] > 0.15:
-            best_r_squared = result["r_squared"]
-            slope = result["slope"]
-
-            # Generate insight text
-            if is_boolean:
-                if slope > 0:
-                    best_insight = f"{factor_name.title()} {direction[1]} your RPE"
-                else:
-                    best_insight = f"{factor_name.title()} {direction[0]} your RPE"
-            else:
-                if slope > 0:
-                    best_insight = f"Higher {factor_name} {direction[1]} RPE"
-                else:
-                    best_insight = f"Higher {factor_name} {direction[0]} RPE"
-
-    return best_insight
+
+store.subscribe(publish_change)
 
 
 # =============================================================================
 # ROUTES
 # =============================================================================
 
-@app.route("/")
-def index():
-    """Dashboard / Home page"""
-    entries = load_data()
-    sorted_entries = sorted(entries, key=lambda x: x["date"], reverse=True) if entries else []
-
-    # Calculate this week's stats
+def dashboard_summary(entries):
+    """This week's totals and the key insights shown on the dashboard"""
     week_miles = 0
-    week_rhr_values = []
-    today = datetime.now().strftime("%Y-%m-%d")
+    avg_rhr = None
 
     if entries:
+        today = datetime.now().strftime("%Y-%m-%d")
         monday, sunday = get_week_bounds(today)
-        week_entries = [e for e in entries if monday <= e["date"] <= sunday]
-        week_miles = sum(e.get("miles", 0) for e in week_entries)
-        week_rhr_values = [e.get("rhr") for e in week_entries if e.get("rhr")]
-
-    avg_rhr = round(sum(week_rhr_values) / len(week_rhr_values), 0) if week_rhr_values else None
+        stats = caches.get_week_stats(monday, sunday)
+        week_miles = stats["total_miles"]
+        avg_rhr = round(stats["avg_rhr"], 0) if stats["avg_rhr"] else None
 
     # Generate key insight using regression analysis on last 7 days
-    key_insight = generate_regression_insight(entries)
+    key_insight = analytics.generate_regression_insight(entries)
     if not key_insight:
         key_insight = "run more for advice"
 
+    since = (datetime.now() - timedelta(days=ALERT_DAYS)).strftime("%Y-%m-%d")
+
+    return {
+        "entry_count": len(entries),
+        "anomalies": caches.recent_anomalies(since),
+        "week_miles": week_miles,
+        "avg_rhr": avg_rhr,
+        "key_insight": key_insight,
+        "prediction": fitness.describe_prediction(caches.predict_marathon(GOAL)),
+        # All-factor model over the whole log
+        "model_insight": analytics.generate_multivariate_insight(),
+    }
+
+
+@app.route("/")
+def index():
+    """Dashboard / Home page"""
+    entries = load_data()
+    sorted_entries = sorted(entries, key=lambda x: x["date"], reverse=True) if entries else []
+
     return render_template("index.html",
                          goal=GOAL,
                          entries=sorted_entries,
-                         entry_count=len(entries),
-                         week_miles=week_miles,
-                         avg_rhr=avg_rhr,
-                         key_insight=key_insight)
+                         flagged=caches.flagged_ids(),
+                         **dashboard_summary(entries))
+
+
+@app.route("/events")
+def events():
+    """Server-Sent Events stream of dashboard changes"""
+    start_feed_worker()
+    feed = queue.Queue(maxsize=FEED_QUEUE_SIZE)
+    feed_subscribers.append(feed)
+
+    def stream():
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    message = feed.get(timeout=FEED_POLL_SECONDS)
+                except queue.Empty:
+                    if feed not in feed_subscribers:
+                        break  # dropped for falling behind
+                    # Pick up writes made by other server processes; any
+                    # records found are published through publish_change
+                    store.refresh()
+                    yield ": keepalive\n\n"
+                    continue
+                yield message
+        finally:
+            if feed in feed_subscribers:
+                feed_subscribers.remove(feed)
+
+    return Response(stream(), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+def entry_from_form(form):
+    """Build an entry dict from the add/edit form"""
+    entry = {}
+
+    # Basic info
+    entry["date"] = form.get("date")
+    entry["time"] = form.get("time")
+    entry["type"] = form.get("type")
+
+    # Run data
+    if entry["type"] == "rest":
+        entry["miles"] = 0
+        entry["pace"] = None
+        entry["hr"] = None
+    else:
+        miles = form.get("miles")
+        entry["miles"] = float(miles) if miles else 0
+        entry["pace"] = form.get("pace") or None
+        hr = form.get("hr")
+        entry["hr"] = int(hr) if hr else None
+
+    # Device metrics
+    rhr = form.get("rhr")
+    entry["rhr"] = int(rhr) if rhr else None
+    hrv = form.get("hrv")
+    entry["hrv"] = int(hrv) if hrv else None
+
+    # Subjective scores
+    rpe = form.get("rpe")
+    entry["rpe"] = int(rpe) if rpe else None
+    sleep = form.get("sleep")
+    entry["sleep"] = int(sleep) if sleep else None
+    stress = form.get("stress")
+    entry["stress"] = int(stress) if stress else None
+
+    # Lifestyle factors
+    caffeine = form.get("caffeine")
+    entry["caffeine"] = int(caffeine) if caffeine else None
+    entry["alcohol"] = form.get("alcohol") == "y"
+    entry["nicotine"] = form.get("nicotine") == "y"
+    entry["travel"] = form.get("travel") == "y"
+    entry["stretch"] = form.get("stretch") == "y"
+    entry["music"] = form.get("music") == "y"
+
+    return entry
 
 
 @app.route("/add", methods=["GET", "POST"])
 def add_entry():
     """Add a new entry"""
     if request.method == "POST":
-        entry = {}
-
-        # Basic info
-        entry["date"] = request.form.get("date")
-        entry["time"] = request.form.get("time")
-        entry["type"] = request.form.get("type")
-
-        # Run data
-        if entry["type"] == "rest":
-            entry["miles"] = 0
-            entry["pace"] = None
-            entry["hr"] = None
-        else:
-            miles = request.form.get("miles")
-            entry["miles"] = float(miles) if miles else 0
-            entry["pace"] = request.form.get("pace") or None
-            hr = request.form.get("hr")
-            entry["hr"] = int(hr) if hr else None
-
-        # Device metrics
-        rhr = request.form.get("rhr")
-        entry["rhr"] = int(rhr) if rhr else None
-        hrv = request.form.get("hrv")
-        entry["hrv"] = int(hrv) if hrv else None
-
-        # Subjective scores
-        rpe = request.form.get("rpe")
-        entry["rpe"] = int(rpe) if rpe else None
-        sleep = request.form.get("sleep")
-        entry["sleep"] = int(sleep) if sleep else None
-        stress = request.form.get("stress")
-        entry["stress"] = int(stress) if stress else None
-
-        # Lifestyle factors
-        caffeine = request.form.get("caffeine")
-        entry["caffeine"] = int(caffeine) if caffeine else None
-        entry["alcohol"] = request.form.get("alcohol") == "y"
-        entry["nicotine"] = request.form.get("nicotine") == "y"
-        entry["travel"] = request.form.get("travel") == "y"
-        entry["stretch"] = request.form.get("stretch") == "y"
-        entry["music"] = request.form.get("music") == "y"
-
-        # Save
-        entries = load_data()
-        entries.append(entry)
-        save_data(entries)
-
+        try:
+            store.add_entry(entry_from_form(request.form))
+        except ValueError as e:
+            abort(400, description=str(e))
         return redirect(url_for("history"))
 
     # GET request - show form
     today = datetime.now().strftime("%Y-%m-%d")
-    return render_template("add.html", today=today)
+    return render_template("add.html", today=today, entry=None)
 
 
-@app.route("/history")
-def history():
-    """View run history"""
-    entries = load_data()
-    sorted_entries = sorted(entries, key=lambda x: x["date"], reverse=True)
-    return render_template("history.html", entries=sorted_entries)
+@app.route("/entry/<int:entry_id>/edit", methods=["GET", "POST"])
+def edit_entry(entry_id):
+    """Correct an existing entry"""
+    load_data()
+    entry = store.get_entry(entry_id)
+    if entry is None:
+        return redirect(url_for("history"))
 
+    if request.method == "POST":
+        try:
+            store.update_entry(entry_id, entry_from_form(request.form))
+        except ValueError as e:
+            abort(400, description=str(e))
+        return redirect(url_for("view_entry", entry_id=entry_id))
+
+    return render_template("add.html", today=entry["date"], entry=entry)
 
-@app.route("/entry/<int:index>")
-def view_entry(index):
+
+@app.route("/entry/<int:entry_id>/delete", methods=["POST"])
+def delete_entry(entry_id):
+    """Remove an entry"""
+    store.delete_entry(entry_id)
+    return redirect(url_for("history"))
+
+
+@app.route("/history")
+def history():
+    """View run history, filtered and paged from the indexes"""
+    load_data()
+
+    # Filters from the query string: ?type=workout&pace_max=6:00&sleep=poor
+    filters = search.parse_filters(request.args)
+    page = max(request.args.get("page", 1, type=int), 1)
+    entries, total = search.search(filters, page)
+
+    # Pager links keep the current filters
+    args = {key: value for key, value in request.args.items() if value and key != "page"}
+    return render_template("history.html",
+                         entries=entries,
+                         matches=total,
+                         total=len(store.cache["entries"]),
+                         page=page,
+                         pages=max((total + search.PAGE_SIZE - 1) // search.PAGE_SIZE, 1),
+                         page_args=args,
+                         factors=BITMAP_FACTORS,
+                         categories=CATEGORY_FIELDS,
+                         filters=request.args)
+
+
+@app.route("/entry/<int:entry_id>")
+def view_entry(entry_id):
     """View single entry details"""
-    entries = load_data()
-    sorted_entries = sorted(entries, key=lambda x: x["date"], reverse=True)
+    load_data()
+    entry = store.get_entry(entry_id)
 
-    if 0 <= index < len(sorted_entries):
-        entry = sorted_entries[index]
-        return render_template("entry.html", entry=entry, index=index)
+    if entry is not None:
+        flags = anomaly.describe(caches.anomaly_flags(entry_id))
+        return render_template("entry.html", entry=entry, flags=flags)
 
     return redirect(url_for("history"))
 
@@ -268,12 +465,7 @@ def weekly():
         return render_template("weekly.html", weeks=[], stats=None)
 
     # Get available weeks
-    weeks_set = set()
-    for entry in entries:
-        monday, sunday = get_week_bounds(entry["date"])
-        weeks_set.add((monday, sunday))
-
-    weeks = sorted(weeks_set, reverse=True)
+    weeks = caches.available_weeks()
 
     # Get selected week (default to most recent)
     selected = request.args.get("week", "0")
@@ -285,50 +477,37 @@ def weekly():
     if week_idx >= len(weeks):
         week_idx = 0
 
-    # Calculate stats for selected week
+    # Stats for selected week
     monday, sunday = weeks[week_idx]
-    week_entries = [e for e in entries if monday <= e["date"] <= sunday]
+    stats = caches.get_week_stats(monday, sunday)
 
-    run_entries = [e for e in week_entries if e.get("type") != "rest"]
-    rest_days = len([e for e in week_entries if e.get("type") == "rest"])
+    return render_template("weekly.html", weeks=weeks, stats=stats, selected=week_idx)
 
-    stats = {
-        "monday": monday,
-        "sunday": sunday,
-        "total_miles": sum(e.get("miles", 0) for e in week_entries),
-        "num_runs": len(run_entries),
-        "rest_days": rest_days,
-    }
 
-    # Calculate averages
-    def avg(key, entry_list):
-        values = [e.get(key) for e in entry_list if e.get(key) is not None]
-        return round(sum(values) / len(values), 1) if values else None
-
-    stats["avg_rhr"] = avg("rhr", week_entries)
-    stats["avg_hrv"] = avg("hrv", week_entries)
-    stats["avg_hr"] = avg("hr", run_entries)
-    stats["avg_rpe"] = avg("rpe", run_entries)
-    stats["avg_sleep"] = avg("sleep", week_entries)
-    stats["avg_stress"] = avg("stress", week_entries)
-
-    # Average pace
-    total_seconds = 0
-    pace_count = 0
-    for e in run_entries:
-        if e.get("pace"):
-            parts = e["pace"].split(":")
-            if len(parts) == 2:
-                total_seconds += int(parts[0]) * 60 + int(parts[1])
-                pace_count += 1
-
-    if pace_count > 0:
-        avg_sec = total_seconds / pace_count
-        stats["avg_pace"] = f"{int(avg_sec // 60)}:{int(avg_sec % 60):02d}"
-    else:
-        stats["avg_pace"] = None
+@app.route("/reports")
+def reports():
+    """Group-by reports answered from the pre-aggregated cube"""
+    load_data()
 
-    return render_template("weekly.html", weeks=weeks, stats=stats, selected=week_idx)
+    group_by = [d for d in request.args.getlist("group") if d in cube.DIMENSIONS] or ["month"]
+    filters = {}
+    for dimension in ("time", "type"):
+        if request.args.get(dimension):
+            filters[dimension] = request.args[dimension]
+    date_from = request.args.get("from") or None
+    date_to = request.args.get("to") or None
+
+    rows = caches.report_rows(group_by, filters, date_from, date_to)
+    for row in rows:
+        if row["pace"]:
+            row["pace"] = format_pace(row["pace"])
+
+    return render_template("reports.html",
+                         rows=rows,
+                         group_by=group_by,
+                         dimensions=cube.DIMENSIONS,
+                         measures=cube.MEASURES,
+                         args=request.args)
 
 
 @app.route("/insights")
@@ -341,135 +520,29 @@ def insights():
                              has_data=False,
                              needed=5 - len(entries))
 
-    results = {}
-
-    # Analyze boolean factors
-    factors = [
-        ("alcohol", "Alcohol"),
-        ("nicotine", "Nicotine"),
-        ("travel", "Travel"),
-        ("stretch", "Stretching"),
-        ("music", "Music"),
-    ]
-
-    metrics = [
-        ("rpe", "RPE", True),
-        ("rhr", "RHR", True),
-        ("hrv", "HRV", False),
-    ]
-
-    factor_results = []
-    for factor_key, factor_name in factors:
-        impacts = []
-        for metric_key, metric_name, higher_is_worse in metrics:
-            impact = calculate_impact(entries, factor_key, metric_key, higher_is_worse)
-            if impact:
-                impacts.append({"metric": metric_name, "impact": impact})
-        if impacts:
-            factor_results.append({"name": factor_name, "impacts": impacts})
-
-    results["factors"] = factor_results
-
-    # Sleep impact
-    results["sleep"] = analyze_sleep_impact(entries)
-
-    # Caffeine impact
-    results["caffeine"] = analyze_caffeine_impact(entries)
+    results = {
+        "factors": analytics.analyze_factor_impact(),
+        "sleep": analytics.analyze_sleep_impact(),
+        "caffeine": analytics.analyze_caffeine_impact(),
+        # Delayed (lagged) effects
+        "lag": analytics.analyze_lag_impact(),
+        "bests": [
+            (label, format_pace(pace), miles, entry_id)
+            for label, pace, miles, entry_id in caches.personal_bests()
+        ],
+        "prediction": fitness.describe_prediction(caches.predict_marathon(GOAL)),
+    }
 
     return render_template("insights.html", has_data=True, results=results)
 
 
-def calculate_impact(entries, factor_key, metric_key, higher_is_worse):
-    """Calculate impact of a boolean factor on a metric"""
-    with_factor = [e for e in entries if e.get(factor_key) is True and e.get(metric_key) is not None]
-    without_factor = [e for e in entries if e.get(factor_key) is False and e.get(metric_key) is not None]
-
-    if len(with_factor) < 2 or len(without_factor) < 2:
-        return None
-
-    avg_with = sum(e[metric_key] for e in with_factor) / len(with_factor)
-    avg_without = sum(e[metric_key] for e in without_factor) / len(without_factor)
-
-    diff = avg_with - avg_without
-
-    if higher_is_worse:
-        if diff > 0.5:
-            direction = "negative"
-        elif diff < -0.5:
-            direction = "positive"
-        else:
-            return "no significant impact"
-    else:
-        if diff > 0.5:
-            direction = "positive"
-        elif diff < -0.5:
-            direction = "negative"
-        else:
-            return "no significant impact"
-
-    magnitude = abs(diff)
-    if magnitude > 2:
-        strength = "strong"
-    elif magnitude > 1:
-        strength = "moderate"
-    else:
-        strength = "minor"
-
-    return f"{strength} {direction} ({avg_with:.1f} vs {avg_without:.1f})"
-
-
-def analyze_sleep_impact(entries):
-    """Analyze how sleep quality affects metrics"""
-    good_sleep = [e for e in entries if e.get("sleep") and e["sleep"] >= 7]
-    poor_sleep = [e for e in entries if e.get("sleep") and e["sleep"] <= 4]
-
-    if len(good_sleep) < 2 or len(poor_sleep) < 2:
-        return [{"text": "Not enough varied sleep data yet"}]
-
-    results = []
-    for metric_key, metric_name in [("rpe", "RPE"), ("rhr", "RHR"), ("hrv", "HRV")]:
-        good_vals = [e[metric_key] for e in good_sleep if e.get(metric_key)]
-        poor_vals = [e[metric_key] for e in poor_sleep if e.get(metric_key)]
-
-        if good_vals and poor_vals:
-            good_avg = sum(good_vals) / len(good_vals)
-            poor_avg = sum(poor_vals) / len(poor_vals)
-            diff = poor_avg - good_avg
-
-            if abs(diff) > 0.5:
-                direction = "higher" if diff > 0 else "lower"
-                results.append({
-                    "text": f"{metric_name}: {direction} with poor sleep ({poor_avg:.1f} vs {good_avg:.1f})"
-                })
-
-    return results if results else [{"text": "No significant correlations found"}]
-
-
-def analyze_caffeine_impact(entries):
-    """Analyze caffeine consumption impact"""
-    no_caffeine = [e for e in entries if e.get("caffeine") == 0 or e.get("caffeine") is None]
-    with_caffeine = [e for e in entries if e.get("caffeine") and e["caffeine"] > 0]
-
-    if len(no_caffeine) < 2 or len(with_caffeine) < 2:
-        return [{"text": "Not enough varied caffeine data yet"}]
-
-    results = []
-    for metric_key, metric_name in [("rpe", "RPE"), ("rhr", "RHR")]:
-        no_vals = [e[metric_key] for e in no_caffeine if e.get(metric_key)]
-        with_vals = [e[metric_key] for e in with_caffeine if e.get(metric_key)]
-
-        if no_vals and with_vals:
-            no_avg = sum(no_vals) / len(no_vals)
-            with_avg = sum(with_vals) / len(with_vals)
-            diff = with_avg - no_avg
-
-            if abs(diff) > 0.5:
-                direction = "higher" if diff > 0 else "lower"
-                results.append({
-                    "text": f"{metric_name}: {direction} with caffeine ({with_avg:.1f} vs {no_avg:.1f})"
-                })
+# =============================================================================
+# STARTUP
+# =============================================================================
 
-    return results if results else [{"text": "No significant impact detected"}]
+# Done at import so forked workers inherit the results
+build_assets()
+precompile_templates()
 
 
 # =============================================================================
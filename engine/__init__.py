@@ -0,0 +1,18 @@
+# Training Journal - Engine
+# Storage, caches and analytics shared by tracker.py (CLI) and app.py (web)
+#
+#   store      append-only journal on top of the JSON log
+#   weekly     Monday-Sunday week bounds, pace parsing and weekly stats
+#   regression simple and multiple regression against RPE
+#   bitmap     bitset and sorted range indexes over factors and fields
+#   cube       pre-aggregated group-by report cube
+#   anomaly    EWMA baselines flagging RHR spikes / HRV drops
+#   fitness    personal bests per distance and marathon predictions
+#   derived    precomputed tables on disk, rebuilt by a checkpointed job
+#   caches     derived caches kept in step with every store change
+#   search     filtered, paginated history from the indexes
+#   analytics  insights (factor impact, sleep, caffeine, lag, key insights)
+#   streaming  one-pass aggregators for logs too big to load
+#   profiling  opt-in time and memory reports for the analytics paths
+#
+# Front-ends only format results; every aggregation lives here once.
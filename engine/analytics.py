@@ -0,0 +1,413 @@
+# Training Journal - Analytics
+# Insights shown by both front-ends: factor impact, sleep and caffeine
+# effects, delayed (lagged) effects and the dashboard key insights
+#
+# Results are plain strings; tracker.py prints them and app.py renders them.
+# Impact, sleep and caffeine comparisons are answered from the bitmap index
+# (see caches), so they only touch the entries in each group.
+
+from datetime import datetime, timedelta
+
+from engine import caches, regression, store
+from engine.bitmap import factor_bits, iter_bits, popcount
+from engine.profiling import profiled
+
+
+# =============================================================================
+# KEY INSIGHTS
+# =============================================================================
+
+def get_last_7_days_entries(entries):
+    """Get entries from the last 7 days"""
+    today = datetime.now()
+    seven_days_ago = (today - timedelta(days=7)).strftime("%Y-%m-%d")
+    today_str = today.strftime("%Y-%m-%d")
+    return [e for e in entries if seven_days_ago <= e.get("date", "") <= today_str]
+
+
+@profiled
+def generate_regression_insight(entries):
+    """Generate key insight using regression analysis on last 7 days data"""
+    recent_entries = get_last_7_days_entries(entries)
+
+    if len(recent_entries) < 3:
+        return None
+
+    best_insight = None
+    best_r_squared = 0
+
+    # Get entries with RPE data
+    rpe_entries = [e for e in recent_entries if e.get("rpe") is not None]
+    if len(rpe_entries) < 3:
+        return None
+
+    for factor_key, factor_name, is_boolean, direction in regression.REGRESSION_FACTORS:
+        # Build x and y arrays
+        x_values = []
+        y_values = []
+
+        for entry in rpe_entries:
+            factor_val = entry.get(factor_key)
+            if factor_val is not None:
+                if is_boolean:
+                    x_values.append(1 if factor_val else 0)
+                else:
+                    x_values.append(float(factor_val))
+                y_values.append(float(entry["rpe"]))
+
+        if len(x_values) < 3:
+            continue
+
+        result = regression.simple_linear_regression(x_values, y_values)
+        if result and result["r_squared"] > best_r_squared and result["r_squared"] > 0.15:
+            best_r_squared = result["r_squared"]
+            slope = result["slope"]
+
+            # Generate insight text
+            if is_boolean:
+                if slope > 0:
+                    best_insight = f"{factor_name.title()} {direction[1]} your RPE"
+                else:
+                    best_insight = f"{factor_name.title()} {direction[0]} your RPE"
+            else:
+                if slope > 0:
+                    best_insight = f"Higher {factor_name} {direction[1]} RPE"
+                else:
+                    best_insight = f"Higher {factor_name} {direction[0]} RPE"
+
+    return best_insight
+
+
+@profiled
+def generate_multivariate_insight():
+    """Key insight from one regression over all factors at once.
+
+    Unlike generate_regression_insight, each factor's effect is measured
+    with the others held fixed, so correlated factors (sleep, stress,
+    HRV) are not double-counted.
+    """
+    # The sums are updated in place by writers
+    with store._lock:
+        result = regression.fit_multiple_regression(caches.regression_stats)
+    if not result or result["r_squared"] < 0.15:
+        return None
+
+    # Pick the factor with the largest effect per typical (1 SD) change
+    best = None
+    for i, (factor_key, factor_name, is_boolean, direction) in enumerate(regression.REGRESSION_FACTORS, 1):
+        effect = result["coefficients"][i] * result["std_devs"][i]
+        if abs(effect) >= 0.3 and (best is None or abs(effect) > abs(best[0])):
+            best = (effect, factor_name, is_boolean, direction)
+
+    if not best:
+        return None
+
+    effect, factor_name, is_boolean, direction = best
+    verb = direction[1] if effect > 0 else direction[0]
+    if is_boolean:
+        text = f"{factor_name.title()} {verb} your RPE"
+    else:
+        text = f"Higher {factor_name} {verb} RPE"
+    return f"{text}, other factors held equal (R² {result['r_squared']:.2f}, n={result['n']})"
+
+
+# =============================================================================
+# FACTOR IMPACT
+# =============================================================================
+
+# Boolean factors compared with/without: (factor_key, factor_name)
+IMPACT_FACTORS = [
+    ("alcohol", "Alcohol"),
+    ("nicotine", "Nicotine"),
+    ("travel", "Travel"),
+    ("stretch", "Stretching"),
+    ("music", "Music"),
+]
+
+# Metrics they are compared on: (metric_key, metric_name, higher_is_worse)
+IMPACT_METRICS = [
+    ("rpe", "RPE", True),
+    ("rhr", "RHR", True),
+    ("hrv", "HRV", False),
+]
+
+
+def describe_impact(avg_with, avg_without, higher_is_worse):
+    """Describe the difference between with/without averages"""
+    diff = avg_with - avg_without
+
+    # Determine impact direction and magnitude
+    if higher_is_worse:
+        if diff > 0.5:
+            direction = "negative"
+        elif diff < -0.5:
+            direction = "positive"
+        else:
+            return "no significant impact"
+    else:
+        if diff > 0.5:
+            direction = "positive"
+        elif diff < -0.5:
+            direction = "negative"
+        else:
+            return "no significant impact"
+
+    magnitude = abs(diff)
+    if magnitude > 2:
+        strength = "strong"
+    elif magnitude > 1:
+        strength = "moderate"
+    else:
+        strength = "minor"
+
+    return f"{strength} {direction} impact ({avg_with:.1f} vs {avg_without:.1f})"
+
+
+def average_over(bits, metric_key):
+    """Mean of a metric over the entries in a bitset (call under store._lock)"""
+    return sum(store.get_entry(i)[metric_key] for i in iter_bits(bits)) / popcount(bits)
+
+
+@profiled
+def calculate_impact(factor_key, metric_key, higher_is_worse):
+    """Calculate impact of a boolean factor on a metric"""
+    # Under the lock so a concurrent delete can't empty a bit we read
+    with store._lock:
+        index = caches.bitmap_index
+        has_metric = index["present"][metric_key]
+        with_factor = factor_bits(index, factor_key, True) & has_metric
+        without_factor = factor_bits(index, factor_key, False) & has_metric
+
+        if popcount(with_factor) < 2 or popcount(without_factor) < 2:
+            return None
+        avg_with = average_over(with_factor, metric_key)
+        avg_without = average_over(without_factor, metric_key)
+
+    return describe_impact(avg_with, avg_without, higher_is_worse)
+
+
+@profiled
+def analyze_factor_impact():
+    """[(factor_name, [(metric_name, impact), ...])] for factors with data"""
+    results = []
+    for factor_key, factor_name in IMPACT_FACTORS:
+        impacts = []
+        for metric_key, metric_name, higher_is_worse in IMPACT_METRICS:
+            impact = calculate_impact(factor_key, metric_key, higher_is_worse)
+            if impact:
+                impacts.append((metric_name, impact))
+        if impacts:
+            results.append((factor_name, impacts))
+    return results
+
+
+@profiled
+def compare_groups(group_bits, other_bits, metrics, label):
+    """Lines for metrics that differ by more than 0.5 between two groups"""
+    results = []
+    for metric_key, metric_name in metrics:
+        with store._lock:
+            has_metric = caches.bitmap_index["present"][metric_key]
+            group_vals = [v for v in (store.get_entry(i)[metric_key] for i in iter_bits(group_bits & has_metric)) if v]
+            other_vals = [v for v in (store.get_entry(i)[metric_key] for i in iter_bits(other_bits & has_metric)) if v]
+
+        if group_vals and other_vals:
+            group_avg = sum(group_vals) / len(group_vals)
+            other_avg = sum(other_vals) / len(other_vals)
+            diff = group_avg - other_avg
+
+            if abs(diff) > 0.5:
+                direction = "higher" if diff > 0 else "lower"
+                results.append(f"{metric_name}: {direction} {label} ({group_avg:.1f} vs {other_avg:.1f})")
+    return results
+
+
+@profiled
+def analyze_sleep_impact():
+    """Analyze how sleep quality affects metrics (poor 1-4 vs good 7-10)"""
+    with store._lock:
+        good_sleep = caches.bitmap_index["sleep"]["good"]
+        poor_sleep = caches.bitmap_index["sleep"]["poor"]
+
+    if popcount(good_sleep) < 2 or popcount(poor_sleep) < 2:
+        return ["Not enough data (need entries with varied sleep quality)"]
+
+    results = compare_groups(poor_sleep, good_sleep,
+                             [("rpe", "RPE"), ("rhr", "RHR"), ("hrv", "HRV")],
+                             "with poor sleep")
+    return results if results else ["No significant correlations found"]
+
+
+@profiled
+def analyze_caffeine_impact():
+    """Analyze caffeine consumption impact (no caffeine includes unlogged)"""
+    with store._lock:
+        with_caffeine = caches.bitmap_index["caffeine"]
+        no_caffeine = caches.bitmap_index["all"] & ~with_caffeine
+
+    if popcount(no_caffeine) < 2 or popcount(with_caffeine) < 2:
+        return ["Not enough data (need entries with varied caffeine intake)"]
+
+    results = compare_groups(with_caffeine, no_caffeine,
+                             [("rpe", "RPE"), ("rhr", "RHR")],
+                             "with caffeine")
+    return results if results else ["No significant impact detected"]
+
+
+# =============================================================================
+# DELAYED EFFECTS
+# =============================================================================
+
+# Factors and metrics used for the lag analysis
+# Each factor tuple: (factor_key, factor_name, is_boolean)
+LAG_FACTORS = [
+    ("sleep", "sleep quality", False),
+    ("stress", "stress", False),
+    ("caffeine", "caffeine", False),
+    ("alcohol", "alcohol", True),
+    ("nicotine", "nicotine", True),
+    ("travel", "travel", True),
+    ("stretch", "stretching", True),
+    ("music", "music", True),
+]
+LAG_METRICS = [("rpe", "RPE"), ("rhr", "RHR"), ("hrv", "HRV")]
+MAX_LAG = 7
+
+
+@profiled
+def build_daily_matrix(entries, keys):
+    """Align entries to one row per calendar day from first to last date.
+
+    Each row holds the day's mean value for every key (booleans count as
+    1/0), or None when no entry that day has the value.
+    """
+    dates = [e["date"] for e in entries if e.get("date")]
+    if not dates:
+        return []
+
+    first = datetime.strptime(min(dates), "%Y-%m-%d")
+    last = datetime.strptime(max(dates), "%Y-%m-%d")
+    num_days = (last - first).days + 1
+
+    sums = [[0.0] * len(keys) for _ in range(num_days)]
+    counts = [[0] * len(keys) for _ in range(num_days)]
+
+    for entry in entries:
+        if not entry.get("date"):
+            continue
+        day = (datetime.strptime(entry["date"], "%Y-%m-%d") - first).days
+        for k, key in enumerate(keys):
+            value = entry.get(key)
+            if value is None:
+                continue
+            sums[day][k] += float(value)
+            counts[day][k] += 1
+
+    return [
+        [s / c if c else None for s, c in zip(day_sums, day_counts)]
+        for day_sums, day_counts in zip(sums, counts)
+    ]
+
+
+@profiled
+def calculate_lag_correlations(entries, max_lag=MAX_LAG):
+    """Correlate every factor with every metric at lags 0..max_lag days.
+
+    The factor x metric x lag grid is filled in a single pass over the
+    daily matrix, accumulating running sums for every cell at once.
+    Returns grid[factor_idx][metric_idx][lag] = (correlation, n) or None.
+    """
+    factor_keys = [f[0] for f in LAG_FACTORS]
+    metric_keys = [m[0] for m in LAG_METRICS]
+    factor_rows = build_daily_matrix(entries, factor_keys)
+    metric_rows = build_daily_matrix(entries, metric_keys)
+    num_days = len(factor_rows)
+
+    # sums[f][m][lag] = [n, sx, sy, sxx, syy, sxy]
+    sums = [[[[0, 0.0, 0.0, 0.0, 0.0, 0.0] for _ in range(max_lag + 1)]
+             for _ in metric_keys] for _ in factor_keys]
+
+    for day in range(num_days):
+        present_factors = [(f, x) for f, x in enumerate(factor_rows[day]) if x is not None]
+        if not present_factors:
+            continue
+        for lag in range(min(max_lag, num_days - 1 - day) + 1):
+            present_metrics = [(m, y) for m, y in enumerate(metric_rows[day + lag]) if y is not None]
+            for f, x in present_factors:
+                for m, y in present_metrics:
+                    cell = sums[f][m][lag]
+                    cell[0] += 1
+                    cell[1] += x
+                    cell[2] += y
+                    cell[3] += x * x
+                    cell[4] += y * y
+                    cell[5] += x * y
+
+    grid = []
+    for factor_cells in sums:
+        factor_grid = []
+        for metric_cells in factor_cells:
+            lag_results = []
+            for n, sx, sy, sxx, syy, sxy in metric_cells:
+                if n < 5:
+                    lag_results.append(None)
+                    continue
+                x_variance = sxx - sx * sx / n
+                y_variance = syy - sy * sy / n
+                if x_variance <= 1e-9 or y_variance <= 1e-9:
+                    lag_results.append(None)
+                    continue
+                covariance = sxy - sx * sy / n
+                lag_results.append((covariance / (x_variance * y_variance) ** 0.5, n))
+            factor_grid.append(lag_results)
+        grid.append(factor_grid)
+
+    return grid
+
+
+def lag_correlations():
+    """Lag grid for the whole log, computed once per change to the store.
+
+    Like the weekly rollups, a miss copies the entries under the store
+    lock and computes from the copy; the result is only cached if no
+    write happened in between.
+    """
+    with store._lock:
+        if caches.lag_grid is not None:
+            return caches.lag_grid
+        entries = list(store.cache["entries"].values())
+        seen = caches.generation
+
+    grid = calculate_lag_correlations(entries)
+    with store._lock:
+        if caches.generation == seen:
+            caches.lag_grid = grid
+    return grid
+
+
+@profiled
+def analyze_lag_impact():
+    """Find the strongest delayed effect of each factor on RPE/RHR/HRV"""
+    grid = lag_correlations()
+
+    results = []
+    for (factor_key, factor_name, is_boolean), factor_grid in zip(LAG_FACTORS, grid):
+        best = None
+        for (metric_key, metric_name), lag_results in zip(LAG_METRICS, factor_grid):
+            for lag, result in enumerate(lag_results):
+                if result and abs(result[0]) >= 0.3 and (best is None or abs(result[0]) > abs(best[0])):
+                    best = (result[0], result[1], metric_name, lag)
+
+        if best:
+            correlation, n, metric_name, lag = best
+            direction = "higher" if correlation > 0 else "lower"
+            if lag == 0:
+                when = "same day"
+            elif lag == 1:
+                when = "next day"
+            else:
+                when = f"{lag} days later"
+            label = factor_name.title() if is_boolean else f"Higher {factor_name}"
+            results.append(f"{label}: {metric_name} {direction} {when} (r={correlation:+.2f}, n={n})")
+
+    return results if results else ["No delayed effects detected yet"]
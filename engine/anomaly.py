@@ -0,0 +1,130 @@
+# Training Journal - Anomaly Detection
+# Flags resting HR spikes and HRV drops as entries come in
+#
+# Each metric keeps an exponentially weighted moving average and variance
+# (EWMA), so scoring and updating a new entry is O(1) and never rescans
+# history. A day is flagged when it sits more than THRESHOLD deviations
+# from the baseline in the bad direction (RHR up, HRV down).
+
+# Metrics watched: (metric_key, label, bad_direction)
+METRICS = [
+    ("rhr", "RHR spike", 1),
+    ("hrv", "HRV drop", -1),
+]
+
+# Baseline span in entries (about two weeks of daily logging)
+SPAN = 14
+ALPHA = 2 / (SPAN + 1)
+
+# Entries needed before a baseline is trusted
+WARMUP = 7
+
+# Deviations from baseline that count as an anomaly
+THRESHOLD = 2.0
+
+
+def new_detector():
+    """Empty detector: per-metric EWMA state plus flags by entry id"""
+    return {
+        "baselines": {key: {"mean": None, "var": 0.0, "n": 0} for key, _, _ in METRICS},
+        "flags": {},  # entry id -> {metric_key: {"value", "baseline", "z"}}
+        "dates": {},  # entry id -> date, for flagged entries
+    }
+
+
+def score(detector, entry):
+    """Flags for an entry against the current baselines (no update)"""
+    flags = {}
+    for key, _, direction in METRICS:
+        value = entry.get(key)
+        baseline = detector["baselines"][key]
+        if value is None or baseline["n"] < WARMUP or baseline["var"] <= 0:
+            continue
+        z = (value - baseline["mean"]) / baseline["var"] ** 0.5
+        if z * direction >= THRESHOLD:
+            flags[key] = {"value": value, "baseline": round(baseline["mean"], 1), "z": round(z, 1)}
+    return flags
+
+
+def _record(detector, entry, flags):
+    if flags:
+        detector["flags"][entry["id"]] = flags
+        detector["dates"][entry["id"]] = entry["date"]
+
+
+def observe(detector, entry):
+    """Score a new entry, then fold it into the baselines. Returns its flags.
+
+    Entries are expected roughly in date order; a backdated entry is scored
+    against today's baseline and folded in like any other.
+    """
+    flags = score(detector, entry)
+    _record(detector, entry, flags)
+    _learn(detector, entry, [key for key, _, _ in METRICS])
+    return flags
+
+
+def _learn(detector, entry, keys):
+    """Fold an entry's values for keys into the baselines"""
+    for key in keys:
+        value = entry.get(key)
+        if value is None:
+            continue
+        baseline = detector["baselines"][key]
+        if baseline["mean"] is None:
+            baseline["mean"] = float(value)
+        else:
+            diff = value - baseline["mean"]
+            increment = ALPHA * diff
+            baseline["mean"] += increment
+            baseline["var"] = (1 - ALPHA) * (baseline["var"] + diff * increment)
+        baseline["n"] += 1
+
+
+def forget(detector, entry_id):
+    """Drop the flags for an entry (edited or deleted)"""
+    detector["flags"].pop(entry_id, None)
+    detector["dates"].pop(entry_id, None)
+
+
+def rescore(detector, entry, old=None):
+    """Re-flag an edited entry against the current baselines.
+
+    EWMA baselines cannot un-learn the original value, so changing a value
+    only changes the entry's flags. A metric the edit fills in for the
+    first time (a device push merged into the day, RHR added later) is
+    learned now, as observe() would have if it had been there from the start.
+    """
+    forget(detector, entry["id"])
+    flags = score(detector, entry)
+    _record(detector, entry, flags)
+    if old is not None:
+        _learn(detector, entry, [key for key, _, _ in METRICS if old.get(key) is None])
+    return flags
+
+
+def build_detector(entries):
+    """Detector with every entry observed in date order"""
+    detector = new_detector()
+    for entry in sorted(entries, key=lambda e: e["date"]):
+        observe(detector, entry)
+    return detector
+
+
+def describe(flags):
+    """Human-readable lines for an entry's flags"""
+    labels = {key: label for key, label, _ in METRICS}
+    return [
+        f"{labels[key]}: {flag['value']} vs baseline {flag['baseline']} ({flag['z']:+.1f}σ)"
+        for key, flag in flags.items()
+    ]
+
+
+def recent_anomalies(detector, since):
+    """(date, entry_id, lines) for flagged entries on or after since, newest first"""
+    recent = [
+        (date, entry_id, describe(detector["flags"][entry_id]))
+        for entry_id, date in detector["dates"].items()
+        if date >= since
+    ]
+    return sorted(recent, reverse=True)
@@ -0,0 +1,190 @@
+# Training Journal - Bitmap Indexes
+# Bitsets over factors and categories, sorted indexes for ranges; bit i is
+# the entry with id i
+#
+# Filtering on several factors is an AND of bitsets, and counting a set is
+# a popcount, so neither scans the log. Range filters (date, miles, pace,
+# RPE) bisect a sorted (value, id) list and turn the slice into a bitset.
+
+from bisect import bisect_left, bisect_right
+
+from engine.weekly import pace_to_seconds
+
+# Boolean lifestyle factors indexed as bitsets
+BITMAP_FACTORS = ["alcohol", "nicotine", "travel", "stretch", "music"]
+
+# Nullable fields that get a presence bitset
+PRESENCE_FIELDS = BITMAP_FACTORS + ["rpe", "rhr", "hrv", "sleep", "caffeine"]
+
+# Sleep buckets used by analyze_sleep_impact and the history filters
+SLEEP_BUCKETS = {"poor": lambda v: v <= 4, "good": lambda v: v >= 7}
+
+# Categorical fields with one bitset per value
+CATEGORY_FIELDS = {
+    "type": ["workout", "easy", "rest"],
+    "time": ["am", "afternoon", "pm"],
+}
+
+# Fields with a sorted (value, id) index for range filters
+RANGE_FIELDS = ["date", "miles", "pace", "rpe"]
+
+
+def range_value(entry, key):
+    """Value an entry is ranged on (pace in seconds), or None"""
+    value = entry.get(key)
+    if key == "pace" and value:
+        return pace_to_seconds(value)
+    return value
+
+
+def new_bitmap_index():
+    """Empty bitsets for every indexed factor"""
+    return {
+        "all": 0,
+        "true": {key: 0 for key in BITMAP_FACTORS},
+        "present": {key: 0 for key in PRESENCE_FIELDS},
+        "sleep": {bucket: 0 for bucket in SLEEP_BUCKETS},
+        "caffeine": 0,  # entries with at least one cup
+        "category": {key: {value: 0 for value in values} for key, values in CATEGORY_FIELDS.items()},
+        "sorted": {key: [] for key in RANGE_FIELDS},
+        # Ids alone in the same order, so a range slice needs no unpacking
+        "sorted_ids": {key: [] for key in RANGE_FIELDS},
+    }
+
+
+def add_to_bitmap_index(index, entry):
+    """Set the bits for an entry"""
+    bit = 1 << entry["id"]
+    index["all"] |= bit
+
+    for key in PRESENCE_FIELDS:
+        if entry.get(key) is not None:
+            index["present"][key] |= bit
+    for key in BITMAP_FACTORS:
+        if entry.get(key) is True:
+            index["true"][key] |= bit
+
+    sleep = entry.get("sleep")
+    if sleep:
+        for bucket, matches in SLEEP_BUCKETS.items():
+            if matches(sleep):
+                index["sleep"][bucket] |= bit
+
+    if entry.get("caffeine"):
+        index["caffeine"] |= bit
+
+    for key, bitsets in index["category"].items():
+        if entry.get(key) in bitsets:
+            bitsets[entry[key]] |= bit
+
+    for key, values in index["sorted"].items():
+        value = range_value(entry, key)
+        if value is not None:
+            position = bisect_left(values, (value, entry["id"]))
+            values.insert(position, (value, entry["id"]))
+            index["sorted_ids"][key].insert(position, entry["id"])
+
+
+def remove_from_bitmap_index(index, entry):
+    """Clear every bit for an entry"""
+    mask = ~(1 << entry["id"])
+    index["all"] &= mask
+    index["caffeine"] &= mask
+    for bitsets in (index["true"], index["present"], index["sleep"], *index["category"].values()):
+        for key in bitsets:
+            bitsets[key] &= mask
+
+    for key, values in index["sorted"].items():
+        value = range_value(entry, key)
+        if value is not None:
+            position = bisect_left(values, (value, entry["id"]))
+            if position < len(values) and values[position] == (value, entry["id"]):
+                del values[position]
+                del index["sorted_ids"][key][position]
+
+
+def popcount(bits):
+    """Number of set bits"""
+    return bin(bits).count("1")
+
+
+def iter_bits(bits):
+    """Yield the positions of set bits, lowest first.
+
+    Searches the binary string once instead of masking the whole int per
+    bit, which would cost O(n) each and O(n²) for a dense set.
+    """
+    text = bin(bits)[:1:-1]  # lowest bit first
+    position = text.find("1")
+    while position != -1:
+        yield position
+        position = text.find("1", position + 1)
+
+
+# Byte 0/1 flags to "0"/"1" digits for bits_from_ids
+_FLAG_DIGITS = bytes.maketrans(b"\x00\x01", b"01")
+
+
+def bits_from_ids(ids):
+    """Bitset with the given positions set, built in one pass.
+
+    Sets one byte per id and converts the lot at once, instead of OR-ing
+    in a new n-bit int per id.
+    """
+    if not ids:
+        return 0
+    flags = bytearray(max(ids) + 1)
+    for entry_id in ids:
+        flags[entry_id] = 1
+    return int(flags[::-1].translate(_FLAG_DIGITS), 2)
+
+
+def factor_bits(index, factor_key, value):
+    """Bitset of entries where a boolean factor is True/False"""
+    if value:
+        return index["true"][factor_key]
+    return index["present"][factor_key] & ~index["true"][factor_key]
+
+
+def range_bits(index, key, low=None, high=None):
+    """Bitset of entries with low <= value <= high (None = unbounded)"""
+    values = index["sorted"][key]
+    start = bisect_left(values, (low,)) if low is not None else 0
+    end = bisect_right(values, (high, float("inf"))) if high is not None else len(values)
+
+    return bits_from_ids(index["sorted_ids"][key][start:end])
+
+
+def filter_bits(index, filters):
+    """AND together the bitsets for a dict of history filters.
+
+    filters maps a factor key to True/False, "sleep" to a bucket name,
+    "type"/"time" to a value, or a RANGE_FIELDS key to a (low, high) pair.
+    """
+    bits = index["all"]
+    for key, value in filters.items():
+        if key == "sleep":
+            bits &= index["sleep"][value]
+        elif key in CATEGORY_FIELDS:
+            bits &= index["category"][key][value]
+        elif key in RANGE_FIELDS:
+            bits &= range_bits(index, key, *value)
+        else:
+            bits &= factor_bits(index, key, value)
+    return bits
+
+
+def page_ids(index, bits, offset, limit):
+    """Ids of set bits in newest-first date order, skipping offset, at most limit"""
+    # One string of the bits, lowest first, so membership is an index
+    matches = bin(bits)[:1:-1]
+    ids = []
+    for entry_id in reversed(index["sorted_ids"]["date"]):
+        if entry_id < len(matches) and matches[entry_id] == "1":
+            if offset:
+                offset -= 1
+            elif len(ids) < limit:
+                ids.append(entry_id)
+            else:
+                break
+    return ids
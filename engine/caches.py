@@ -0,0 +1,188 @@
+# Training Journal - Derived Caches
+# Indexes and rollups kept in step with every change to the store
+#
+# Importing this module subscribes it to the store. The first load emits a
+# "reset" that builds everything; after that each add, edit or delete is
+# applied in place for the old and new versions of the entry, so neither
+# front-end rescans the log to answer a query.
+
+from engine import anomaly, bitmap, cube, derived, fitness, regression, store
+from engine.profiling import profiled
+from engine.weekly import compute_week_stats, get_week_bounds, week_stats
+
+# Running X'X / X'y sums for the multiple regression
+regression_stats = None
+
+# Bitsets over boolean factors, sleep buckets and caffeine
+bitmap_index = None
+
+# Weekly rollups by Monday, computed on demand and dropped when an entry in
+# that week changes
+weekly_rollups = {}
+
+# Number of entries per week (Monday), for the week selector
+week_counts = {}
+
+# Lag correlation grid for the whole log (analytics.lag_correlations),
+# dropped on every change and recomputed on the next request
+lag_grid = None
+
+# Bumped on every change, so a rollup computed from an older copy of the
+# entries is not cached over a newer one
+generation = 0
+
+# Sums and counts by (month, week, time, type) for group-by reports
+report_cube = cube.new_cube()
+
+# EWMA baselines and flags for RHR spikes / HRV drops
+anomaly_detector = anomaly.new_detector()
+
+# Best paces per distance bucket and workout VDOTs for race predictions
+fitness_index = fitness.new_fitness_index()
+
+
+def on_store_change(op, old, new):
+    """Keep derived caches in step with every change to the store.
+
+    Only the weeks an edit touches lose their rollups and the lag grid is
+    dropped whole; the regression sums, bitsets, report cube and fitness
+    index are updated in place for the old and new versions.
+    """
+    global regression_stats, bitmap_index, report_cube, anomaly_detector, fitness_index, generation, lag_grid
+    generation += 1
+    lag_grid = None
+
+    if op == "reset":
+        weekly_rollups.clear()
+        week_counts.clear()
+        bitmap_index = bitmap.new_bitmap_index()
+        fitness_index = fitness.new_fitness_index()
+
+        # Tables precomputed by derived.recompute() for this exact log
+        # replace folding every entry into the sums. They only cover the
+        # base file, so they are skipped once journal records have been
+        # applied (a listener subscribing late, or one being rebuilt)
+        tables = None
+        if store.cache["journal_offset"] == 0:
+            tables = derived.load_tables(store.cache["stamp"])
+        if tables:
+            regression_stats = tables["regression"]
+            report_cube = tables["cube"]
+            for monday, totals in tables["weeks"].items():
+                weekly_rollups[monday] = week_stats(monday, totals)
+                week_counts[monday] = totals["runs"] + totals["rest"]
+        else:
+            regression_stats = regression.new_regression_stats()
+            report_cube = cube.new_cube()
+
+        for entry in store.cache["entries"].values():
+            bitmap.add_to_bitmap_index(bitmap_index, entry)
+            fitness.add_to_fitness_index(fitness_index, entry)
+            if not tables:
+                regression.update_regression_stats(regression_stats, entry)
+                cube.add_to_cube(report_cube, entry)
+                monday = get_week_bounds(entry["date"])[0]
+                week_counts[monday] = week_counts.get(monday, 0) + 1
+
+        # Baselines have to be learned in date order
+        anomaly_detector = anomaly.build_detector(store.cache["entries"].values())
+        return
+
+    # New entries are scored and learned from; edits re-score and learn
+    # only the metrics they fill in
+    if anomaly_detector is not None:
+        if op == "add":
+            anomaly.observe(anomaly_detector, new)
+        elif op == "update":
+            anomaly.rescore(anomaly_detector, new, old)
+        else:
+            anomaly.forget(anomaly_detector, old["id"])
+
+    if old is not None:
+        regression.update_regression_stats(regression_stats, old, sign=-1)
+        bitmap.remove_from_bitmap_index(bitmap_index, old)
+        cube.add_to_cube(report_cube, old, sign=-1)
+        fitness.add_to_fitness_index(fitness_index, old, sign=-1)
+        monday = get_week_bounds(old["date"])[0]
+        weekly_rollups.pop(monday, None)
+        week_counts[monday] -= 1
+        if not week_counts[monday]:
+            del week_counts[monday]
+
+    if new is not None:
+        regression.update_regression_stats(regression_stats, new)
+        bitmap.add_to_bitmap_index(bitmap_index, new)
+        cube.add_to_cube(report_cube, new)
+        fitness.add_to_fitness_index(fitness_index, new)
+        monday = get_week_bounds(new["date"])[0]
+        weekly_rollups.pop(monday, None)
+        week_counts[monday] = week_counts.get(monday, 0) + 1
+
+
+store.subscribe(on_store_change)
+
+
+@profiled
+def get_week_stats(monday, sunday):
+    """Weekly rollup from the cache, computing it on a miss.
+
+    Writes run on other threads, so a miss copies the entries under the
+    store lock and computes from the copy.
+    """
+    with store._lock:
+        stats = weekly_rollups.get(monday)
+        if stats is not None:
+            return stats
+        entries = list(store.cache["entries"].values())
+        seen = generation
+
+    stats = compute_week_stats(entries, monday, sunday)
+    with store._lock:
+        if generation == seen:
+            weekly_rollups[monday] = stats
+    return stats
+
+
+def available_weeks():
+    """(monday, sunday) of every week with entries, most recent first"""
+    with store._lock:
+        mondays = list(week_counts)
+    return sorted((get_week_bounds(monday) for monday in mondays), reverse=True)
+
+
+def anomaly_flags(entry_id):
+    """Flags for one entry ({} when it looks normal)"""
+    return anomaly_detector["flags"].get(entry_id, {})
+
+
+# Readers below walk indexes that writers change in place, so they hold
+# the store lock while they do
+
+def recent_anomalies(since):
+    """Flagged entries on or after since (see anomaly.recent_anomalies)"""
+    with store._lock:
+        return anomaly.recent_anomalies(anomaly_detector, since)
+
+
+def flagged_ids():
+    """Ids of every flagged entry"""
+    with store._lock:
+        return set(anomaly_detector["flags"])
+
+
+def report_rows(group_by, filters=None, date_from=None, date_to=None):
+    """Group-by report rows from the cube (see cube.query_cube)"""
+    with store._lock:
+        return cube.query_cube(report_cube, group_by, filters, date_from, date_to)
+
+
+def personal_bests():
+    """Best pace per distance bucket (see fitness.personal_bests)"""
+    with store._lock:
+        return fitness.personal_bests(fitness_index)
+
+
+def predict_marathon(goal=None):
+    """Marathon prediction from the fitness index (see fitness.predict_marathon)"""
+    with store._lock:
+        return fitness.predict_marathon(fitness_index, goal)
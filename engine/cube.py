@@ -0,0 +1,129 @@
+# Training Journal - Report Cube
+# Pre-aggregated sums and counts for group-by reports
+#
+# Every entry lands in one cell keyed by (month, week, time of day, type).
+# Cells hold additive sums and counts per measure, so any roll-up (by
+# year, month, week, time of day, type or a mix) and any filter on those
+# dimensions is answered by adding up cells instead of scanning entries.
+# Cells are updated in place as entries are added, edited or deleted.
+
+from engine.profiling import profiled
+from engine.weekly import get_week_bounds, pace_to_seconds
+
+# Cell key layout
+CELL_DIMENSIONS = ["month", "week", "time", "type"]
+
+# Dimensions a report can group or filter by ("year" is derived from month)
+DIMENSIONS = ["year", "month", "week", "time", "type"]
+
+# Averaged measures: (measure_key, label)
+MEASURES = [
+    ("pace", "Pace"),
+    ("hr", "HR"),
+    ("rpe", "RPE"),
+    ("rhr", "RHR"),
+    ("hrv", "HRV"),
+]
+
+
+def new_cube():
+    """Empty cube: cell key -> {"entries", "miles", "sums", "counts"}"""
+    return {}
+
+
+def cell_key(entry):
+    """(month, week, time, type) for an entry"""
+    monday = get_week_bounds(entry["date"])[0]
+    return (entry["date"][:7], monday, entry.get("time") or "-", entry.get("type") or "-")
+
+
+def measure_values(entry):
+    """Values an entry contributes to each measure (None = not recorded)"""
+    return {
+        "pace": pace_to_seconds(entry["pace"]) if entry.get("pace") else None,
+        "hr": entry.get("hr"),
+        "rpe": entry.get("rpe"),
+        "rhr": entry.get("rhr"),
+        "hrv": entry.get("hrv"),
+    }
+
+
+def add_to_cube(cube, entry, sign=1):
+    """Add (sign=1) or remove (sign=-1) an entry's contribution to its cell"""
+    key = cell_key(entry)
+    cell = cube.get(key)
+    if cell is None:
+        cell = cube[key] = {
+            "entries": 0,
+            "miles": 0.0,
+            "sums": {m: 0.0 for m, _ in MEASURES},
+            "counts": {m: 0 for m, _ in MEASURES},
+        }
+
+    cell["entries"] += sign
+    cell["miles"] += sign * (entry.get("miles") or 0)
+    for measure, value in measure_values(entry).items():
+        if value is not None:
+            cell["sums"][measure] += sign * value
+            cell["counts"][measure] += sign
+
+    if cell["entries"] <= 0:
+        del cube[key]
+
+
+def dimension_value(key, dimension):
+    """Value of a report dimension for a cell key"""
+    if dimension == "year":
+        return key[0][:4]
+    return key[CELL_DIMENSIONS.index(dimension)]
+
+
+@profiled
+def query_cube(cube, group_by, filters=None, date_from=None, date_to=None):
+    """Roll the cube up by the group_by dimensions.
+
+    filters maps a dimension to the value it must equal. date_from and
+    date_to are "YYYY-MM" months (inclusive). Returns rows sorted by group,
+    each with the group values, entry count, total miles and an average per
+    measure (None where nothing was recorded).
+    """
+    filters = filters or {}
+    groups = {}
+
+    for key, cell in cube.items():
+        month = key[0]
+        if date_from and month < date_from:
+            continue
+        if date_to and month > date_to:
+            continue
+        if any(dimension_value(key, d) != v for d, v in filters.items()):
+            continue
+
+        group = tuple(dimension_value(key, d) for d in group_by)
+        total = groups.get(group)
+        if total is None:
+            total = groups[group] = {
+                "entries": 0,
+                "miles": 0.0,
+                "sums": {m: 0.0 for m, _ in MEASURES},
+                "counts": {m: 0 for m, _ in MEASURES},
+            }
+        total["entries"] += cell["entries"]
+        total["miles"] += cell["miles"]
+        for measure, _ in MEASURES:
+            total["sums"][measure] += cell["sums"][measure]
+            total["counts"][measure] += cell["counts"][measure]
+
+    rows = []
+    for group in sorted(groups):
+        total = groups[group]
+        row = {
+            "group": group,
+            "entries": total["entries"],
+            "miles": total["miles"],
+        }
+        for measure, _ in MEASURES:
+            count = total["counts"][measure]
+            row[measure] = total["sums"][measure] / count if count else None
+        rows.append(row)
+    return rows
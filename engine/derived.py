@@ -0,0 +1,184 @@
+# Training Journal - Derived Tables
+# Precomputed weekly totals, regression sums and report cube on disk
+#
+# recompute() rebuilds the tables from the compacted log in parallel
+# chunks of whole weeks, one process per chunk. Every finished chunk is
+# checkpointed, so an interrupted run picks up where it stopped. The merged
+# tables are written to a temp file and swapped in with os.replace, so a
+# reader sees either the old tables or the new ones, never a mix.
+#
+# caches loads the tables on a reset instead of refolding every entry, as
+# long as they were built from the same DATA_FILE with the same formulas.
+
+import json
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timedelta
+
+from engine import cube, regression, store
+from engine.weekly import add_to_week, get_week_bounds, new_week_totals
+
+# Bump when a derived formula changes; older tables are then ignored
+FORMULA_VERSION = 1
+
+# Weeks of entries per chunk
+CHUNK_WEEKS = 13
+
+# Chunks are aligned to this Monday so every week falls in one chunk
+EPOCH_MONDAY = datetime(2000, 1, 3)
+
+
+def derived_file():
+    """Path of the derived tables next to DATA_FILE"""
+    return os.path.splitext(store.DATA_FILE)[0] + ".derived.json"
+
+
+def checkpoint_dir():
+    """Directory holding finished chunks of an unfinished recompute"""
+    return os.path.splitext(store.DATA_FILE)[0] + ".derived.parts"
+
+
+def write_json_atomic(path, data):
+    """Write JSON to path via a temp file and os.replace"""
+    tmp_file = path + ".tmp"
+    with open(tmp_file, "w") as f:
+        json.dump(data, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_file, path)
+
+
+def read_json(path):
+    """Parsed JSON file, or None if missing or unreadable"""
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+# =============================================================================
+# COMPUTING
+# =============================================================================
+
+def chunk_start(date_str, chunk_weeks=CHUNK_WEEKS):
+    """First Monday of the chunk holding date_str"""
+    monday = datetime.strptime(get_week_bounds(date_str)[0], "%Y-%m-%d")
+    chunk = (monday - EPOCH_MONDAY).days // (7 * chunk_weeks)
+    return (EPOCH_MONDAY + timedelta(weeks=chunk * chunk_weeks)).strftime("%Y-%m-%d")
+
+
+def compute_chunk(entries):
+    """Partial tables for one chunk of entries (runs in a worker process)"""
+    weeks = {}
+    stats = regression.new_regression_stats()
+    cells = cube.new_cube()
+
+    for entry in entries:
+        monday = get_week_bounds(entry["date"])[0]
+        if monday not in weeks:
+            weeks[monday] = new_week_totals()
+        add_to_week(weeks[monday], entry)
+        regression.update_regression_stats(stats, entry)
+        cube.add_to_cube(cells, entry)
+
+    return {
+        "weeks": weeks,
+        "regression": stats,
+        "cube": [[list(key), cell] for key, cell in cells.items()],
+    }
+
+
+def merge_chunks(parts):
+    """Add up chunk results into the full tables"""
+    tables = {"weeks": {}, "regression": regression.new_regression_stats(), "cube": {}}
+    total = tables["regression"]
+
+    for part in parts:
+        # Chunks hold whole weeks, so weeks never overlap
+        tables["weeks"].update(part["weeks"])
+
+        stats = part["regression"]
+        total["n"] += stats["n"]
+        total["yty"] += stats["yty"]
+        for i, row in enumerate(stats["xtx"]):
+            total["xty"][i] += stats["xty"][i]
+            for j, value in enumerate(row):
+                total["xtx"][i][j] += value
+
+        for key, cell in part["cube"]:
+            tables["cube"][tuple(key)] = cell
+
+    return tables
+
+
+# =============================================================================
+# LOADING
+# =============================================================================
+
+def load_tables(stamp):
+    """Derived tables built from DATA_FILE as of stamp, or None if stale"""
+    data = read_json(derived_file())
+    if (data is None or data.get("version") != FORMULA_VERSION
+            or stamp is None or tuple(data.get("stamp") or ()) != tuple(stamp)):
+        return None
+
+    tables = data["tables"]
+    tables["cube"] = {tuple(key): cell for key, cell in tables["cube"]}
+    return tables
+
+
+# =============================================================================
+# RECOMPUTE JOB
+# =============================================================================
+
+def recompute(workers=None, chunk_weeks=CHUNK_WEEKS, progress=print):
+    """Rebuild the derived tables for all history.
+
+    The journal is compacted first so DATA_FILE holds everything. Finished
+    chunks are kept in checkpoint_dir(); running again after an interrupt
+    only computes the missing ones, unless the log or formulas changed in
+    between. Returns the number of chunks computed by this run.
+    """
+    store.refresh()
+    if store.cache["journal_records"]:
+        store.compact()
+
+    entries, stamp = store.read_base()
+    manifest = {"version": FORMULA_VERSION, "stamp": list(stamp or ()), "chunk_weeks": chunk_weeks}
+
+    parts_dir = checkpoint_dir()
+    manifest_file = os.path.join(parts_dir, "manifest.json")
+    if read_json(manifest_file) != manifest:
+        shutil.rmtree(parts_dir, ignore_errors=True)
+        os.makedirs(parts_dir)
+        write_json_atomic(manifest_file, manifest)
+
+    chunks = {}
+    for entry in entries:
+        chunks.setdefault(chunk_start(entry["date"], chunk_weeks), []).append(entry)
+
+    todo = [start for start in sorted(chunks)
+            if not os.path.exists(os.path.join(parts_dir, f"{start}.json"))]
+    progress(f"  {len(chunks)} chunks of {chunk_weeks} weeks, {len(chunks) - len(todo)} already done")
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(compute_chunk, chunks[start]): start for start in todo}
+        for done, future in enumerate(as_completed(futures), 1):
+            start = futures[future]
+            write_json_atomic(os.path.join(parts_dir, f"{start}.json"), future.result())
+            progress(f"  [{done}/{len(todo)}] chunk from {start} ({len(chunks[start])} entries)")
+
+    parts = (read_json(os.path.join(parts_dir, f"{start}.json")) for start in sorted(chunks))
+    tables = merge_chunks(parts)
+    tables["cube"] = [[list(key), cell] for key, cell in tables["cube"].items()]
+
+    write_json_atomic(derived_file(), {
+        "version": FORMULA_VERSION,
+        "stamp": list(stamp or ()),
+        "built": datetime.now().isoformat(timespec="seconds"),
+        "tables": tables,
+    })
+    shutil.rmtree(parts_dir, ignore_errors=True)
+    return len(todo)
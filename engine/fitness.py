@@ -0,0 +1,203 @@
+# Training Journal - Fitness Index
+# Personal bests per distance bucket and race-time predictions
+#
+# Every run lands in the distance bucket it covers, where its pace is kept
+# in a sorted list, so the best effort per bucket is the head of the list
+# and adding or removing a run is one bisect. Workouts are also kept sorted
+# by date with their VDOT, so recent fitness only looks at the last few
+# weeks of workouts. Both are updated in place as entries change.
+#
+#   Riegel:  T2 = T1 * (D2 / D1) ^ 1.06, from the best effort in any bucket
+#   VDOT:    Daniels/Gilbert VO2 cost and %VO2max-by-duration curves, from
+#            the best recent workout, solved for the goal distance
+
+import math
+from bisect import bisect_left, insort
+from datetime import datetime, timedelta
+
+from engine.profiling import profiled
+from engine.weekly import format_pace, pace_to_seconds
+
+# Distance buckets: (label, minimum miles). A run counts toward the longest
+# bucket it covers; runs shorter than the first bucket are not indexed.
+DISTANCE_BUCKETS = [
+    ("5K", 3.1),
+    ("10K", 6.2),
+    ("10 mi", 10.0),
+    ("Half", 13.1),
+    ("20 mi", 20.0),
+    ("Marathon", 26.2),
+]
+
+MARATHON_MILES = 26.2
+METERS_PER_MILE = 1609.344
+
+RIEGEL_EXPONENT = 1.06
+
+# Workouts within this many days count toward current fitness
+FITNESS_DAYS = 42
+
+
+def new_fitness_index():
+    """Empty index: sorted (pace, id, miles) per bucket, sorted (date, id, vdot) workouts"""
+    return {
+        "best": {label: [] for label, _ in DISTANCE_BUCKETS},
+        "workouts": [],
+    }
+
+
+def distance_bucket(miles):
+    """Label of the longest bucket a run covers, or None"""
+    label = None
+    for name, minimum in DISTANCE_BUCKETS:
+        if miles >= minimum:
+            label = name
+    return label
+
+
+def effort(entry):
+    """(bucket, pace_seconds, miles) for a run with distance and pace, or None"""
+    if entry.get("type") == "rest" or not entry.get("miles") or not entry.get("pace"):
+        return None
+    pace = pace_to_seconds(entry["pace"])
+    bucket = distance_bucket(entry["miles"])
+    if not pace or bucket is None:
+        return None
+    return bucket, pace, entry["miles"]
+
+
+def vdot(miles, seconds):
+    """VDOT for covering miles in seconds (Daniels/Gilbert formula)"""
+    minutes = seconds / 60
+    velocity = miles * METERS_PER_MILE / minutes
+    vo2 = -4.60 + 0.182258 * velocity + 0.000104 * velocity ** 2
+    fraction = (0.8 + 0.1894393 * math.exp(-0.012778 * minutes)
+                + 0.2989558 * math.exp(-0.1932605 * minutes))
+    return vo2 / fraction
+
+
+def vdot_race_time(score, miles):
+    """Seconds to cover miles at a given VDOT (bisection on race time)"""
+    low, high = 60.0, 12 * 3600.0
+    for _ in range(60):
+        middle = (low + high) / 2
+        if vdot(miles, middle) > score:
+            low = middle  # too fast for this fitness
+        else:
+            high = middle
+    return (low + high) / 2
+
+
+def riegel_time(miles, seconds, target_miles):
+    """Riegel prediction for target_miles from an effort"""
+    return seconds * (target_miles / miles) ** RIEGEL_EXPONENT
+
+
+def add_to_fitness_index(index, entry, sign=1):
+    """Add (sign=1) or remove (sign=-1) an entry's efforts"""
+    found = effort(entry)
+    if found is None:
+        return
+    bucket, pace, miles = found
+
+    items = [(index["best"][bucket], (pace, entry["id"], miles))]
+    if entry.get("type") == "workout":
+        items.append((index["workouts"], (entry["date"], entry["id"], vdot(miles, pace * miles))))
+
+    for sorted_list, item in items:
+        if sign > 0:
+            insort(sorted_list, item)
+        else:
+            position = bisect_left(sorted_list, item)
+            if position < len(sorted_list) and sorted_list[position] == item:
+                del sorted_list[position]
+
+
+@profiled
+def personal_bests(index):
+    """[(bucket, pace_seconds, miles, entry_id)] for buckets with runs"""
+    return [
+        (label, index["best"][label][0][0], index["best"][label][0][2], index["best"][label][0][1])
+        for label, _ in DISTANCE_BUCKETS
+        if index["best"][label]
+    ]
+
+
+def current_vdot(index, today=None):
+    """Best workout VDOT over the last FITNESS_DAYS, or None"""
+    today = today or datetime.now()
+    since = (today - timedelta(days=FITNESS_DAYS)).strftime("%Y-%m-%d")
+    workouts = index["workouts"]
+    recent = workouts[bisect_left(workouts, (since,)):]
+    return max((score for _, _, score in recent), default=None)
+
+
+def parse_goal(goal):
+    """Seconds for a goal like "2:32:00 Boston", or None"""
+    parts = goal.split()[0].split(":") if goal else []
+    try:
+        values = [int(p) for p in parts]
+    except ValueError:
+        return None
+    if len(values) == 3:
+        return values[0] * 3600 + values[1] * 60 + values[2]
+    if len(values) == 2:
+        return values[0] * 3600 + values[1] * 60
+    return None
+
+
+def format_time(seconds):
+    """Format seconds as H:MM:SS"""
+    seconds = int(round(seconds))
+    return f"{seconds // 3600}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+@profiled
+def predict_marathon(index, goal=None, today=None):
+    """Marathon predictions and the gap to goal.
+
+    Returns {"riegel", "riegel_from", "vdot", "vdot_time", "goal_gap"}
+    (times in seconds, None where there is no data). goal_gap is the
+    faster of the two predictions minus the goal time; negative means
+    ahead of goal.
+    """
+    riegel = None
+    riegel_from = None
+    for label, pace, miles, _ in personal_bests(index):
+        predicted = riegel_time(miles, pace * miles, MARATHON_MILES)
+        if riegel is None or predicted < riegel:
+            riegel, riegel_from = predicted, label
+
+    score = current_vdot(index, today)
+    vdot_time = vdot_race_time(score, MARATHON_MILES) if score else None
+
+    goal_seconds = parse_goal(goal)
+    predictions = [t for t in (riegel, vdot_time) if t]
+    goal_gap = min(predictions) - goal_seconds if goal_seconds and predictions else None
+
+    return {
+        "riegel": riegel,
+        "riegel_from": riegel_from,
+        "vdot": round(score, 1) if score else None,
+        "vdot_time": vdot_time,
+        "goal_gap": goal_gap,
+    }
+
+
+def describe_prediction(prediction):
+    """One-line summary of a predict_marathon result, or None without data"""
+    parts = []
+    if prediction["riegel"]:
+        parts.append(f"Riegel {format_time(prediction['riegel'])} (from {prediction['riegel_from']})")
+    if prediction["vdot_time"]:
+        parts.append(f"VDOT {prediction['vdot']} → {format_time(prediction['vdot_time'])}")
+    if not parts:
+        return None
+
+    gap = prediction["goal_gap"]
+    if gap is not None:
+        if gap > 0:
+            parts.append(f"{format_pace(gap) if gap < 3600 else format_time(gap)} off goal")
+        else:
+            parts.append("on track for goal")
+    return " · ".join(parts)
@@ -0,0 +1,173 @@
+# Training Journal - Profiling
+# Opt-in wall time, memory and call profiles for the analytics hot paths
+#
+# Off unless TRAINING_PROFILE is set or a front-end calls enable(); the
+# @profiled wrapper is then one flag check. When on, each web request,
+# and the analytics work behind each CLI screen, runs as a scope under
+# tracemalloc and cProfile (calls from other threads are left out), and
+# every @profiled function records its calls, wall time, the peak memory it
+# allocated on top of what was live when it started (throwaway lists
+# included) and what it left allocated, in bytes and in blocks. stop()
+# prints the report.
+#
+# Blocks are counted from a tracemalloc snapshot on entry and exit. The
+# snapshots are kept out of the peaks, the call profile and every wall
+# time, callers' included.
+#
+# tracemalloc is process-wide, so scopes are serialized with a lock.
+
+import cProfile
+import functools
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+# Set TRAINING_PROFILE=1 (or pass --profile to tracker.py) to turn it on
+enabled = bool(os.environ.get("TRAINING_PROFILE"))
+
+# Rows of cProfile output shown per report
+TOP_CALLS = 15
+
+# Totals per @profiled function in the current scope:
+# name -> {"calls", "seconds", "peak", "retained", "blocks"}
+stats = {}
+
+# Running peak of each @profiled call in progress, the scope itself first
+peak_stack = []
+
+# The scope being profiled: label, start time and memory, cProfile.Profile,
+# the thread that opened it (only its calls are recorded) and the seconds
+# spent counting blocks so far
+scope = None
+scope_lock = threading.Lock()
+
+
+def enable():
+    """Turn profiling on for the rest of the process"""
+    global enabled
+    enabled = True
+
+
+def profiled(func):
+    """Record calls, wall time and memory for func while a scope is open"""
+    name = f"{func.__module__.removeprefix('engine.')}.{func.__qualname__}"
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        # Calls on other threads (e.g. the change feed) are not part of the
+        # scope and must not touch its stack
+        current = scope
+        if current is None or current["thread"] != threading.get_ident():
+            return func(*args, **kwargs)
+
+        # Hand the peak so far to the caller before measuring our own
+        start_memory, peak = tracemalloc.get_traced_memory()
+        peak_stack[-1] = max(peak_stack[-1], peak)
+        start_blocks = count_blocks(current)
+        tracemalloc.reset_peak()
+        peak_stack.append(start_memory)
+        start_overhead = current["overhead"]
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            seconds = time.perf_counter() - start - (current["overhead"] - start_overhead)
+            end_memory, peak = tracemalloc.get_traced_memory()
+            top = max(peak_stack.pop(), peak)
+            end_blocks = count_blocks(current)
+            tracemalloc.reset_peak()
+            peak_stack[-1] = max(peak_stack[-1], top)
+
+            record = stats.setdefault(name, {"calls": 0, "seconds": 0.0, "peak": 0, "retained": 0, "blocks": 0})
+            record["calls"] += 1
+            record["seconds"] += seconds
+            record["peak"] = max(record["peak"], top - start_memory)
+            record["retained"] += end_memory - start_memory
+            record["blocks"] += end_blocks - start_blocks
+
+    return wrapper
+
+
+def count_blocks(current):
+    """Memory blocks allocated in the scope and still live.
+
+    Only counts: the snapshot's time goes to the scope's overhead and
+    cProfile is paused while it is taken.
+    """
+    start = time.perf_counter()
+    current["profile"].disable()
+    blocks = len(tracemalloc.take_snapshot().traces)
+    current["profile"].enable()
+    current["overhead"] += time.perf_counter() - start
+    return blocks
+
+
+# =============================================================================
+# SCOPES AND REPORTS
+# =============================================================================
+
+def start(label):
+    """Open a profiling scope (one request or command)"""
+    global scope
+    scope_lock.acquire()
+    stats.clear()
+    tracemalloc.start()
+    memory = tracemalloc.get_traced_memory()[0]
+    peak_stack[:] = [memory]
+    scope = {"label": label, "start": time.perf_counter(), "memory": memory,
+             "profile": cProfile.Profile(), "thread": threading.get_ident(), "overhead": 0.0}
+    scope["profile"].enable()
+
+
+def stop(out=None):
+    """Close the scope and print its report"""
+    global scope
+    try:
+        scope["profile"].disable()
+        seconds = time.perf_counter() - scope["start"] - scope["overhead"]
+        peak = max(peak_stack[0], tracemalloc.get_traced_memory()[1]) - scope["memory"]
+        peak_stack.clear()
+        tracemalloc.stop()
+        print(format_report(scope, seconds, peak), file=out or sys.stderr)
+    finally:
+        scope = None
+        scope_lock.release()
+
+
+@contextmanager
+def profile_scope(label):
+    """Profile the with-block as one scope when profiling is enabled"""
+    if not enabled:
+        yield
+        return
+    start(label)
+    try:
+        yield
+    finally:
+        stop()
+
+
+def format_report(scope, seconds, peak):
+    """Text report: per-function table, then the top cProfile entries"""
+    lines = [
+        f"== profile: {scope['label']} | {seconds * 1000:.1f} ms | peak {peak / 1024:.1f} KiB ==",
+        f"  {'function':<42} {'calls':>6} {'total ms':>10} {'peak KiB':>10} {'kept KiB':>10} {'blocks':>8}",
+    ]
+    for name, record in sorted(stats.items(), key=lambda item: -item[1]["seconds"]):
+        lines.append(f"  {name:<42} {record['calls']:>6} {record['seconds'] * 1000:>10.2f}"
+                     f" {record['peak'] / 1024:>10.1f} {record['retained'] / 1024:>10.1f}"
+                     f" {record['blocks']:>+8}")
+
+    buffer = io.StringIO()
+    pstats.Stats(scope["profile"], stream=buffer).sort_stats("cumulative").print_stats(TOP_CALLS)
+    calls = buffer.getvalue().strip().splitlines()
+    # Drop pstats' preamble, keep the column header and rows
+    header = next((i for i, line in enumerate(calls) if line.lstrip().startswith("ncalls")), 0)
+    lines.append("")
+    lines.extend("  " + line for line in calls[header:])
+    return "\n".join(lines)
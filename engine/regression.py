@@ -0,0 +1,170 @@
+# Training Journal - Regression
+# Simple and multiple linear regression of lifestyle factors against RPE
+#
+# The multiple regression works from running X'X / X'y sums, so an entry
+# is added or removed in O(k^2) and refitting never rescans history.
+
+
+def simple_linear_regression(x_values, y_values):
+    """Calculate simple linear regression coefficients and correlation"""
+    n = len(x_values)
+    if n < 3:
+        return None
+
+    # Calculate means
+    x_mean = sum(x_values) / n
+    y_mean = sum(y_values) / n
+
+    # Calculate slope and correlation
+    numerator = sum((x - x_mean) * (y - y_mean) for x, y in zip(x_values, y_values))
+    x_variance = sum((x - x_mean) ** 2 for x in x_values)
+    y_variance = sum((y - y_mean) ** 2 for y in y_values)
+
+    if x_variance == 0 or y_variance == 0:
+        return None
+
+    slope = numerator / x_variance
+    correlation = numerator / (x_variance ** 0.5 * y_variance ** 0.5)
+
+    return {
+        "slope": slope,
+        "correlation": correlation,
+        "r_squared": correlation ** 2
+    }
+
+
+# Factors analyzed against RPE
+# Each tuple: (factor_key, factor_name, is_boolean, direction_text)
+REGRESSION_FACTORS = [
+    ("sleep", "sleep quality", False, ("improves", "hurts")),
+    ("stress", "stress", False, ("helps", "increases")),
+    ("caffeine", "caffeine", False, ("helps", "increases")),
+    ("alcohol", "alcohol", True, ("lowers", "raises")),
+    ("nicotine", "nicotine", True, ("lowers", "raises")),
+    ("travel", "travel", True, ("helps", "hurts")),
+    ("stretch", "stretching", True, ("helps", "hurts")),
+    ("hrv", "HRV", False, ("correlates with higher", "correlates with lower")),
+    ("rhr", "resting HR", False, ("correlates with lower", "correlates with higher")),
+]
+
+
+# Numeric factors that get a "missing" indicator column in the multiple
+# regression. Missing caffeine counts as none and missing booleans as "no",
+# matching how the insights page already treats them.
+MISSING_INDICATOR_FACTORS = ["sleep", "stress", "hrv", "rhr"]
+
+
+def regression_row(entry):
+    """Build the design-matrix row for an entry, or None without RPE"""
+    if entry.get("rpe") is None:
+        return None
+
+    row = [1.0]
+    for factor_key, _, is_boolean, _ in REGRESSION_FACTORS:
+        value = entry.get(factor_key)
+        if is_boolean:
+            row.append(1.0 if value else 0.0)
+        else:
+            row.append(float(value) if value is not None else 0.0)
+    for factor_key in MISSING_INDICATOR_FACTORS:
+        row.append(1.0 if entry.get(factor_key) is None else 0.0)
+    return row
+
+
+def new_regression_stats():
+    """Empty sufficient statistics for the multiple regression"""
+    k = 1 + len(REGRESSION_FACTORS) + len(MISSING_INDICATOR_FACTORS)
+    return {
+        "n": 0,  # rows used in the fit
+        "xtx": [[0.0] * k for _ in range(k)],
+        "xty": [0.0] * k,
+        "yty": 0.0,
+    }
+
+
+def update_regression_stats(stats, entry, sign=1):
+    """Add (sign=1) or remove (sign=-1) one entry in O(k^2)"""
+    row = regression_row(entry)
+    if row is None:
+        return
+
+    y = float(entry["rpe"])
+    stats["n"] += sign
+    stats["yty"] += sign * y * y
+    xtx = stats["xtx"]
+    xty = stats["xty"]
+    for i, xi in enumerate(row):
+        if xi == 0:
+            continue
+        xty[i] += sign * xi * y
+        xtx_row = xtx[i]
+        for j, xj in enumerate(row):
+            xtx_row[j] += sign * xi * xj
+
+
+def solve_linear_system(matrix, vector):
+    """Solve matrix * x = vector by Gaussian elimination with partial pivoting"""
+    size = len(vector)
+    a = [list(row) + [vector[i]] for i, row in enumerate(matrix)]
+
+    for col in range(size):
+        pivot = max(range(col, size), key=lambda r: abs(a[r][col]))
+        if abs(a[pivot][col]) < 1e-12:
+            return None
+        a[col], a[pivot] = a[pivot], a[col]
+        for r in range(col + 1, size):
+            factor = a[r][col] / a[col][col]
+            if factor:
+                for c in range(col, size + 1):
+                    a[r][c] -= factor * a[col][c]
+
+    solution = [0.0] * size
+    for r in range(size - 1, -1, -1):
+        total = a[r][size] - sum(a[r][c] * solution[c] for c in range(r + 1, size))
+        solution[r] = total / a[r][r]
+    return solution
+
+
+def fit_multiple_regression(stats, ridge=1e-3):
+    """Solve the normal equations from the running sums in O(k^3).
+
+    A small ridge term keeps the system solvable when a column is constant
+    (e.g. a factor never logged). Returns coefficients, column standard
+    deviations and r_squared, or None with too little data.
+    """
+    n = stats["n"]
+    k = len(stats["xty"])
+    if n < k + 2:
+        return None
+
+    xtx = [list(row) for row in stats["xtx"]]
+    for i in range(1, k):
+        xtx[i][i] += ridge * n
+    coefficients = solve_linear_system(xtx, stats["xty"])
+    if coefficients is None:
+        return None
+
+    # Column spreads come straight from the sums (column 0 is the intercept)
+    std_devs = [0.0]
+    for j in range(1, k):
+        mean = stats["xtx"][0][j] / n
+        variance = stats["xtx"][j][j] / n - mean ** 2
+        std_devs.append(max(variance, 0.0) ** 0.5)
+
+    y_mean = stats["xty"][0] / n
+    total = stats["yty"] - n * y_mean ** 2
+    if total <= 0:
+        return None
+    fitted = sum(b * xy for b, xy in zip(coefficients, stats["xty"]))
+    fitted_sq = sum(
+        coefficients[i] * stats["xtx"][i][j] * coefficients[j]
+        for i in range(k) for j in range(k)
+    )
+    residual = stats["yty"] - 2 * fitted + fitted_sq
+
+    return {
+        "coefficients": coefficients,
+        "std_devs": std_devs,
+        "r_squared": 1 - residual / total,
+        "n": n,
+    }
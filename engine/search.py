@@ -0,0 +1,66 @@
+# Training Journal - History Search
+# Filtered, paginated history answered from the bitmap and range indexes
+#
+# Both front-ends describe a search as a mapping of strings (the query
+# string on the web, prompt answers in the CLI); parse_filters() turns it
+# into index filters and search() returns one page of matching entries.
+
+from datetime import datetime
+
+from engine import caches, store
+from engine.bitmap import (BITMAP_FACTORS, CATEGORY_FIELDS, SLEEP_BUCKETS,
+                           filter_bits, page_ids, popcount)
+from engine.profiling import profiled
+from engine.weekly import pace_to_seconds
+
+# Entries per page
+PAGE_SIZE = 50
+
+# Range filters: (field, low_arg, high_arg, parse)
+RANGE_ARGS = [
+    ("date", "from", "to", lambda v: datetime.strptime(v, "%Y-%m-%d").strftime("%Y-%m-%d")),
+    ("miles", "miles_min", "miles_max", float),
+    ("pace", "pace_min", "pace_max", pace_to_seconds),
+    ("rpe", "rpe_min", "rpe_max", int),
+]
+
+
+def parse_filters(args):
+    """Index filters from string args; blank or malformed values are ignored.
+
+    Recognized: a factor key with y/n, sleep=poor|good, type, time, and
+    from/to, miles_min/max, pace_min/max (M:SS), rpe_min/max.
+    """
+    filters = {}
+    for key in BITMAP_FACTORS:
+        if args.get(key) in ("y", "n"):
+            filters[key] = args[key] == "y"
+    if args.get("sleep") in SLEEP_BUCKETS:
+        filters["sleep"] = args["sleep"]
+    for key, values in CATEGORY_FIELDS.items():
+        if args.get(key) in values:
+            filters[key] = args[key]
+
+    for field, low_arg, high_arg, parse in RANGE_ARGS:
+        bounds = []
+        for arg in (low_arg, high_arg):
+            try:
+                bounds.append(parse(args[arg]) if args.get(arg) else None)
+            except ValueError:
+                bounds.append(None)
+        if bounds != [None, None]:
+            filters[field] = tuple(bounds)
+
+    return filters
+
+
+@profiled
+def search(filters, page=1, page_size=PAGE_SIZE):
+    """(entries on this page, newest first; total matches)"""
+    # Indexes and entries read together, so a concurrent delete can't
+    # leave a matched id without its entry
+    with store._lock:
+        index = caches.bitmap_index
+        bits = filter_bits(index, filters)
+        ids = page_ids(index, bits, (max(page, 1) - 1) * page_size, page_size)
+        return [store.get_entry(i) for i in ids], popcount(bits)
@@ -0,0 +1,521 @@
+# Training Journal - Data Store
+# Append-only journal on top of the JSON log, shared by tracker.py and app.py
+#
+# training_data.json holds the compacted log (a JSON list of entries).
+# Every add, edit and delete is appended as one JSON line to
+# training_data.journal, so a write costs one small append instead of
+# rewriting the whole log. The write that takes the journal to
+# COMPACT_THRESHOLD records folds it back into training_data.json.
+
+import json
+import os
+import sys
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking
+    fcntl = None
+
+# File to store data
+DATA_FILE = "training_data.json"
+
+# Fold the journal into DATA_FILE after this many records
+COMPACT_THRESHOLD = 200
+
+# Allowed values for an entry's time of day and type
+ENTRY_TIMES = ["am", "afternoon", "pm"]
+ENTRY_TYPES = ["workout", "easy", "rest"]
+
+# In-memory copy of the log, kept current by tailing the journal
+cache = {
+    "loaded": False,
+    "stamp": None,         # (inode, mtime, size) of DATA_FILE when loaded
+    "journal_offset": 0,   # bytes of the journal already applied
+    "journal_records": 0,  # records in the journal since last compaction
+    "entries": {},         # id -> entry, in log order
+    "next_id": 1,
+}
+
+# Callbacks notified of every change, see subscribe()
+listeners = []
+
+# Guards cache within this process (Flask serves requests on threads)
+_lock = threading.RLock()
+
+
+# =============================================================================
+# PATHS AND LOCKING
+# =============================================================================
+
+def journal_file():
+    """Path of the journal next to DATA_FILE"""
+    return os.path.splitext(DATA_FILE)[0] + ".journal"
+
+
+@contextmanager
+def _file_lock(exclusive):
+    """Cross-process lock on DATA_FILE.lock (shared for reads, exclusive for writes)"""
+    if fcntl is None:
+        yield
+        return
+    with open(DATA_FILE + ".lock", "a") as handle:
+        fcntl.flock(handle, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+def _stat_stamp(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+# =============================================================================
+# CHANGE NOTIFICATION
+# =============================================================================
+
+def subscribe(callback):
+    """Register callback(op, old, new) for every change to the log.
+
+    op is "add", "update" or "delete" with the entry before/after the
+    change (None where it does not apply), or "reset" (old and new None)
+    after the whole log was reloaded, e.g. when another process compacted
+    it. Callbacks run for writes from this process and for journal records
+    picked up from other processes alike. A callback registered after the
+    log was loaded gets a "reset" straight away to build from.
+    """
+    with _lock:
+        listeners.append(callback)
+        if cache["loaded"]:
+            callback("reset", None, None)
+
+
+def _notify(op, old, new):
+    """Call every listener; one that fails is rebuilt with a "reset".
+
+    A listener that raised half-way through a change would otherwise be
+    left out of step with the cache for good.
+    """
+    for callback in listeners:
+        try:
+            callback(op, old, new)
+        except Exception as e:
+            if op == "reset":
+                raise
+            print(f"store: listener failed on {op} ({e!r}); rebuilding it", file=sys.stderr)
+            callback("reset", None, None)
+
+
+# =============================================================================
+# LOADING
+# =============================================================================
+
+def _apply(record):
+    """Apply one journal record to the cache. Replaying a record is harmless."""
+    entries = cache["entries"]
+    op = record["op"]
+
+    if op in ("add", "update"):
+        entry = record["entry"]
+        old = entries.get(entry["id"])
+        entries[entry["id"]] = entry
+        cache["next_id"] = max(cache["next_id"], entry["id"] + 1)
+        _notify("update" if old is not None else "add", old, entry)
+    elif op == "delete":
+        old = entries.pop(record["id"], None)
+        if old is not None:
+            _notify("delete", old, None)
+
+    cache["journal_records"] += 1
+
+
+def _reload():
+    """Read DATA_FILE from scratch and replay the whole journal"""
+    # Nobody can be compacting while we hold the file lock, so a temp file
+    # is left over from a compaction that died; drop it
+    if fcntl is not None:
+        try:
+            os.remove(DATA_FILE + ".tmp")
+        except FileNotFoundError:
+            pass
+
+    try:
+        with open(DATA_FILE, "r") as f:
+            base = json.load(f)
+    except FileNotFoundError:
+        base = []
+
+    # Entries written before the journal existed have no id yet; number them
+    # after the highest existing id, in file order, so every process agrees
+    next_id = max((e["id"] for e in base if "id" in e), default=0) + 1
+    entries = {}
+    for entry in base:
+        if "id" not in entry:
+            entry["id"] = next_id
+            next_id += 1
+        entries[entry["id"]] = entry
+
+    cache["loaded"] = True
+    cache["stamp"] = _stat_stamp(DATA_FILE)
+    cache["journal_offset"] = 0
+    cache["journal_records"] = 0
+    cache["entries"] = entries
+    cache["next_id"] = next_id
+
+    # Listeners rebuild from the base log, then see journal records one by one
+    _notify("reset", None, None)
+    _tail_journal()
+
+
+def _tail_journal():
+    """Apply journal records appended since the last read"""
+    try:
+        with open(journal_file(), "rb") as f:
+            f.seek(cache["journal_offset"])
+            data = f.read()
+    except FileNotFoundError:
+        return
+
+    # Only complete lines; a half-written last line is picked up next time
+    end = data.rfind(b"\n") + 1
+    for line in data[:end].splitlines():
+        record = _decode_record(line)
+        if record is not None:
+            _apply(record)
+    cache["journal_offset"] += end
+
+
+def _decode_record(line):
+    """Journal record on a line, or None for a blank or corrupt line.
+
+    A line can only be corrupt if a writer died mid-append before the
+    journal was repaired, or was written before entries were validated;
+    skipping it loses that one write, not the log.
+    """
+    if not line.strip():
+        return None
+    try:
+        record = json.loads(line)
+    except ValueError:
+        return None
+    return record if _valid_record(record) else None
+
+
+def _catch_up():
+    """Reload if another process compacted the log, else tail the journal"""
+    journal_size = (_stat_stamp(journal_file()) or (0, 0, 0))[2]
+    if (not cache["loaded"] or cache["stamp"] != _stat_stamp(DATA_FILE)
+            or journal_size < cache["journal_offset"]):
+        _reload()
+    else:
+        _tail_journal()
+
+
+def refresh():
+    """Bring the cache up to date with the files on disk"""
+    with _lock, _file_lock(exclusive=False):
+        _catch_up()
+
+
+def load_entries():
+    """All live entries in log order"""
+    refresh()
+    with _lock:
+        return list(cache["entries"].values())
+
+
+def get_entry(entry_id):
+    """Entry with the given id, or None (does not re-read the files)"""
+    return cache["entries"].get(entry_id)
+
+
+def read_base():
+    """(entries, stamp) of DATA_FILE alone, ignoring the journal.
+
+    For jobs that precompute from the compacted log; the stamp matches
+    cache["stamp"] in any process that has loaded the same file.
+    """
+    with _file_lock(exclusive=False):
+        stamp = _stat_stamp(DATA_FILE)
+        try:
+            with open(DATA_FILE, "r") as f:
+                return json.load(f), stamp
+        except FileNotFoundError:
+            return [], stamp
+
+
+# =============================================================================
+# STREAMING
+# =============================================================================
+
+def _iter_json_array(path, chunk_size=1 << 16):
+    """Yield the elements of a JSON list file one at a time.
+
+    Reads fixed-size chunks and decodes one element at a time, so memory
+    holds a single chunk plus the element being decoded.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    pos = 0
+    started = False
+
+    with open(path, "r") as f:
+        while True:
+            # Skip separators between elements
+            while pos < len(buffer) and buffer[pos] in " \t\r\n,[]":
+                if buffer[pos] == "[":
+                    started = True
+                pos += 1
+
+            if pos < len(buffer) and started:
+                try:
+                    element, end = decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    pass  # element continues in the next chunk
+                else:
+                    yield element
+                    pos = end
+                    continue
+
+            chunk = f.read(chunk_size)
+            if not chunk:
+                if buffer[pos:].strip():
+                    raise ValueError(f"{path}: truncated JSON list")
+                return
+            buffer = buffer[pos:] + chunk
+            pos = 0
+
+
+def _iter_json_lines(path, skip_corrupt=False):
+    """Yield one decoded record per non-empty line"""
+    with open(path, "r") as f:
+        for line in f:
+            if skip_corrupt:
+                record = _decode_record(line)
+                if record is not None:
+                    yield record
+            elif line.strip():
+                yield json.loads(line)
+
+
+def iter_entries(data_file=None):
+    """Yield live entries one at a time without loading the log into memory.
+
+    data_file defaults to DATA_FILE. A .jsonl file is read as one entry per
+    line; otherwise the file is a JSON list and its journal (if any) is
+    applied on the fly. Memory is bounded by the journal, which compaction
+    keeps small, not by the size of the log.
+    """
+    data_file = data_file or DATA_FILE
+    if data_file.endswith(".jsonl"):
+        yield from _iter_json_lines(data_file)
+        return
+
+    # Final state of every entry the journal touches (None = deleted)
+    journal = os.path.splitext(data_file)[0] + ".journal"
+    changes = {}
+    if os.path.exists(journal):
+        for record in _iter_json_lines(journal, skip_corrupt=True):
+            if record["op"] == "delete":
+                changes[record["id"]] = None
+            else:
+                changes[record["entry"]["id"]] = record["entry"]
+
+    if not os.path.exists(data_file):
+        base = iter(())
+        next_id = 1
+    elif changes:
+        # Entries without an id are numbered as _reload() would, which needs
+        # the highest id first: one extra pass, still constant memory
+        next_id = max((e["id"] for e in _iter_json_array(data_file) if "id" in e), default=0) + 1
+        base = _iter_json_array(data_file)
+    else:
+        base = _iter_json_array(data_file)
+        next_id = None
+
+    for entry in base:
+        if next_id is not None and "id" not in entry:
+            entry["id"] = next_id
+            next_id += 1
+        if entry.get("id") in changes:
+            entry = changes.pop(entry["id"])
+            if entry is None:
+                continue
+        yield entry
+
+    # Entries added since the last compaction
+    for entry in changes.values():
+        if entry is not None:
+            yield entry
+
+
+# =============================================================================
+# VALIDATION
+# =============================================================================
+
+def validate_entry(entry):
+    """Raise ValueError unless every index can take the entry.
+
+    Checked before anything reaches the journal: a bad date or pace would
+    otherwise be replayed, and fail, in every process that loads the log.
+    """
+    try:
+        datetime.strptime(entry.get("date"), "%Y-%m-%d")
+    except (TypeError, ValueError):
+        raise ValueError("date must be a real YYYY-MM-DD date")
+    if entry.get("time") not in ENTRY_TIMES:
+        raise ValueError(f"time must be one of {'/'.join(ENTRY_TIMES)}")
+    if entry.get("type") not in ENTRY_TYPES:
+        raise ValueError(f"type must be one of {'/'.join(ENTRY_TYPES)}")
+
+    pace = entry.get("pace")
+    if pace is not None:
+        parts = pace.split(":") if isinstance(pace, str) else []
+        if len(parts) != 2 or not all(part.isdigit() for part in parts):
+            raise ValueError("pace must be M:SS")
+
+    miles = entry.get("miles")
+    if miles is not None and (isinstance(miles, bool) or not isinstance(miles, (int, float))):
+        raise ValueError("miles must be a number")
+
+
+def _valid_record(record):
+    """True for a well-formed journal record"""
+    if not isinstance(record, dict):
+        return False
+    if record.get("op") == "delete":
+        return isinstance(record.get("id"), int)
+    if record.get("op") in ("add", "update") and isinstance(record.get("entry"), dict):
+        try:
+            validate_entry(record["entry"])
+        except ValueError:
+            return False
+        return isinstance(record["entry"].get("id"), int)
+    return False
+
+
+# =============================================================================
+# WRITING
+# =============================================================================
+
+def write_batch(make_records):
+    """Append several records in one locked write and return them.
+
+    make_records() runs under the exclusive lock, after catching up with
+    other processes, and returns a list of records ({"op": "add"|"update",
+    "entry"} or {"op": "delete", "id"}). Added entries are numbered here.
+    All records go to the journal in a single append, synced to disk
+    before the cache sees them. Raises ValueError, writing nothing, if any
+    entry fails validate_entry().
+    """
+    with _lock, _file_lock(exclusive=True):
+        # Catch up first so ids and offsets account for other processes
+        _catch_up()
+
+        records = make_records()
+        for record in records:
+            if record["op"] != "delete":
+                validate_entry(record["entry"])
+
+        next_id = cache["next_id"]
+        for record in records:
+            if record["op"] == "add":
+                record["entry"] = dict(record["entry"], id=next_id)
+                next_id += 1
+
+        data = b"".join((json.dumps(record) + "\n").encode("utf-8") for record in records)
+        if data:
+            # Bytes past the last applied line are a write that died
+            # half-way; cut them off so this record starts on its own line
+            journal_size = (_stat_stamp(journal_file()) or (0, 0, 0))[2]
+            if journal_size > cache["journal_offset"]:
+                os.truncate(journal_file(), cache["journal_offset"])
+
+            with open(journal_file(), "ab") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            cache["journal_offset"] += len(data)
+            for record in records:
+                _apply(record)
+
+        # Compacted here rather than on a background thread: forked request
+        # workers exit right after the response and would kill the thread
+        if cache["journal_records"] >= COMPACT_THRESHOLD:
+            _compact()
+
+    return records
+
+
+def _write(make_record):
+    """Append one record built by make_record() (None to skip)"""
+    def make_records():
+        record = make_record()
+        return [record] if record is not None else []
+
+    records = write_batch(make_records)
+    return records[0] if records else None
+
+
+def add_entry(entry):
+    """Append a new entry and return it with its assigned id"""
+    return _write(lambda: {"op": "add", "entry": dict(entry)})["entry"]
+
+
+def update_entry(entry_id, entry):
+    """Replace an entry's fields; returns the new entry or None if missing"""
+    def make_record():
+        if entry_id not in cache["entries"]:
+            return None
+        return {"op": "update", "entry": dict(entry, id=entry_id)}
+
+    record = _write(make_record)
+    return record["entry"] if record else None
+
+
+def delete_entry(entry_id):
+    """Record a tombstone for an entry; returns False if it did not exist"""
+    def make_record():
+        if entry_id not in cache["entries"]:
+            return None
+        return {"op": "delete", "id": entry_id}
+
+    return _write(make_record) is not None
+
+
+# =============================================================================
+# COMPACTION
+# =============================================================================
+
+def compact():
+    """Fold the journal into DATA_FILE and start a fresh journal"""
+    with _lock, _file_lock(exclusive=True):
+        _catch_up()
+        _compact()
+
+
+def _compact():
+    """compact() for a caller already holding the exclusive lock.
+
+    The new log is written to a temp file and swapped in with os.replace,
+    then the journal is truncated. If we die in between, replaying the old
+    journal over the new log gives the same result.
+    """
+    tmp_file = DATA_FILE + ".tmp"
+    with open(tmp_file, "w") as f:
+        json.dump(list(cache["entries"].values()), f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_file, DATA_FILE)
+    open(journal_file(), "w").close()
+
+    cache["stamp"] = _stat_stamp(DATA_FILE)
+    cache["journal_offset"] = 0
+    cache["journal_records"] = 0
@@ -0,0 +1,120 @@
+# Training Journal - Streaming Aggregation
+# One-pass, constant-memory summaries over logs too big to load at once
+#
+# Each aggregator is a generator: prime it with next(), send() it entries
+# one at a time, then send None to get its result back. run_aggregators()
+# feeds a single stream of entries (e.g. store.iter_entries()) to several
+# aggregators at once, so the log is read exactly once.
+
+from engine.analytics import IMPACT_FACTORS, IMPACT_METRICS
+from engine.regression import REGRESSION_FACTORS
+from engine.weekly import add_to_week, get_week_bounds, new_week_totals, week_stats
+
+
+def run_aggregators(entries, aggregators):
+    """Feed every entry to each aggregator; returns their results in order"""
+    for aggregator in aggregators:
+        next(aggregator)
+    for entry in entries:
+        for aggregator in aggregators:
+            aggregator.send(entry)
+    return [aggregator.send(None) for aggregator in aggregators]
+
+
+def weekly_stats_aggregator():
+    """Per-week totals and averages; memory grows with weeks, not entries.
+
+    Result: list of week stats dicts (newest first), as shown by the
+    weekly summary.
+    """
+    weeks = {}
+
+    entry = yield
+    while entry is not None:
+        monday = get_week_bounds(entry["date"])[0]
+        totals = weeks.get(monday)
+        if totals is None:
+            totals = weeks[monday] = new_week_totals()
+        add_to_week(totals, entry)
+        entry = yield
+
+    yield [week_stats(monday, weeks[monday]) for monday in sorted(weeks, reverse=True)]
+
+
+def factor_impact_aggregator():
+    """With/without averages for each boolean factor and metric.
+
+    Result: {(factor_key, metric_key): (avg_with, avg_without)} for pairs
+    with at least two entries on each side.
+    """
+    # [with_sum, with_count, without_sum, without_count] per pair
+    sums = {(f, m): [0.0, 0, 0.0, 0] for f, _ in IMPACT_FACTORS for m, _, _ in IMPACT_METRICS}
+
+    entry = yield
+    while entry is not None:
+        for factor_key, _ in IMPACT_FACTORS:
+            factor = entry.get(factor_key)
+            if factor is None:
+                continue
+            side = 0 if factor is True else 2
+            for metric_key, _, _ in IMPACT_METRICS:
+                value = entry.get(metric_key)
+                if value is not None:
+                    cell = sums[(factor_key, metric_key)]
+                    cell[side] += value
+                    cell[side + 1] += 1
+        entry = yield
+
+    yield {
+        pair: (with_sum / with_count, without_sum / without_count)
+        for pair, (with_sum, with_count, without_sum, without_count) in sums.items()
+        if with_count >= 2 and without_count >= 2
+    }
+
+
+def regression_sums_aggregator():
+    """Running regression sums of each factor against RPE.
+
+    Result: {factor_key: {"n", "slope", "correlation", "r_squared"}} for
+    factors with enough varied data.
+    """
+    # [n, sx, sy, sxx, syy, sxy] per factor
+    sums = {factor[0]: [0, 0.0, 0.0, 0.0, 0.0, 0.0] for factor in REGRESSION_FACTORS}
+
+    entry = yield
+    while entry is not None:
+        rpe = entry.get("rpe")
+        if rpe is not None:
+            y = float(rpe)
+            for factor_key, _, is_boolean, _ in REGRESSION_FACTORS:
+                value = entry.get(factor_key)
+                if value is None:
+                    continue
+                x = (1.0 if value else 0.0) if is_boolean else float(value)
+                cell = sums[factor_key]
+                cell[0] += 1
+                cell[1] += x
+                cell[2] += y
+                cell[3] += x * x
+                cell[4] += y * y
+                cell[5] += x * y
+        entry = yield
+
+    results = {}
+    for factor_key, (n, sx, sy, sxx, syy, sxy) in sums.items():
+        if n < 3:
+            continue
+        x_variance = sxx - sx * sx / n
+        y_variance = syy - sy * sy / n
+        if x_variance <= 1e-9 or y_variance <= 1e-9:
+            continue
+        covariance = sxy - sx * sy / n
+        correlation = covariance / (x_variance * y_variance) ** 0.5
+        results[factor_key] = {
+            "n": n,
+            "slope": covariance / x_variance,
+            "correlation": correlation,
+            "r_squared": correlation ** 2,
+        }
+
+    yield results
@@ -0,0 +1,84 @@
+# Training Journal - Weekly Stats
+# Monday-Sunday weeks, pace parsing and the per-week totals and averages
+
+from datetime import datetime, timedelta
+
+
+def get_week_bounds(date_str):
+    """Get Monday and Sunday of the week containing date_str"""
+    date = datetime.strptime(date_str, "%Y-%m-%d")
+    monday = date - timedelta(days=date.weekday())
+    sunday = monday + timedelta(days=6)
+    return monday.strftime("%Y-%m-%d"), sunday.strftime("%Y-%m-%d")
+
+
+def pace_to_seconds(pace):
+    """Convert an M:SS pace string to seconds, or None if malformed"""
+    parts = pace.split(":")
+    if len(parts) != 2:
+        return None
+    try:
+        return int(parts[0]) * 60 + int(parts[1])
+    except ValueError:
+        return None
+
+
+def format_pace(seconds):
+    """Format seconds per mile as M:SS"""
+    return f"{int(seconds // 60)}:{int(seconds % 60):02d}"
+
+
+def new_week_totals():
+    """Empty running totals for one week"""
+    return {"miles": 0.0, "runs": 0, "rest": 0, "sums": {}, "counts": {}}
+
+
+def add_to_week(totals, entry):
+    """Fold one entry into a week's running totals"""
+    is_run = entry.get("type") != "rest"
+    totals["miles"] += entry.get("miles") or 0
+    if is_run:
+        totals["runs"] += 1
+    else:
+        totals["rest"] += 1
+
+    # Averages: device/subjective over all days, effort metrics over runs
+    values = {key: entry.get(key) for key in ("rhr", "hrv", "sleep", "stress")}
+    if is_run:
+        values["hr"] = entry.get("hr")
+        values["rpe"] = entry.get("rpe")
+        values["pace"] = pace_to_seconds(entry["pace"]) if entry.get("pace") else None
+    for key, value in values.items():
+        if value is not None:
+            totals["sums"][key] = totals["sums"].get(key, 0) + value
+            totals["counts"][key] = totals["counts"].get(key, 0) + 1
+
+
+def week_stats(monday, totals):
+    """Stats dict for a week from its running totals"""
+    sunday = (datetime.strptime(monday, "%Y-%m-%d") + timedelta(days=6)).strftime("%Y-%m-%d")
+    stats = {
+        "monday": monday,
+        "sunday": sunday,
+        "total_miles": totals["miles"],
+        "num_runs": totals["runs"],
+        "rest_days": totals["rest"],
+    }
+
+    for key in ("rhr", "hrv", "hr", "rpe", "sleep", "stress"):
+        count = totals["counts"].get(key)
+        stats[f"avg_{key}"] = round(totals["sums"][key] / count, 1) if count else None
+
+    count = totals["counts"].get("pace")
+    stats["avg_pace"] = format_pace(totals["sums"]["pace"] / count) if count else None
+
+    return stats
+
+
+def compute_week_stats(entries, monday, sunday):
+    """Calculate stats for one Monday-Sunday week"""
+    totals = new_week_totals()
+    for entry in entries:
+        if monday <= entry["date"] <= sunday:
+            add_to_week(totals, entry)
+    return week_stats(monday, totals)
@@ -0,0 +1,453 @@
+# Training Journal - Device Ingestion
+# Asyncio (ASGI) JSON endpoint for watches and phone apps pushing data
+#
+# Usage:
+#   python ingest.py serve --port 8001          (needs uvicorn)
+#   python ingest.py simulate --days 60 --clients 32
+#
+# POST /ingest takes one push or a list of pushes:
+#
+#   {"date": "2026-10-18", "rhr": 44, "hrv": 81}
+#   {"date": "2026-10-18", "run": {"time": "am", "type": "easy",
+#                                  "miles": 8.1, "pace": "7:12", "hr": 141}}
+#
+# Pushes are queued and flushed to the store in batches (every
+# FLUSH_SECONDS, or sooner once BATCH_SIZE pushes are waiting). A flush
+# merges every push for the same day into that day's entry and writes the
+# whole batch as one journal append. Each request is answered once its
+# pushes are on disk, so a 200 means the data is saved.
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from engine import store
+
+# Flush when this many pushes are waiting...
+BATCH_SIZE = 200
+
+# ...and at least this often while any are waiting
+FLUSH_SECONDS = 0.2
+
+# Largest request body accepted
+MAX_BODY = 256 * 1024
+
+# Fields a device can report for a day, and their types
+DEVICE_FIELDS = {"rhr": int, "hrv": int}
+
+# Fields of a completed run
+RUN_FIELDS = {"time": str, "type": str, "miles": float, "pace": str, "hr": int}
+RUN_TIMES = ["am", "afternoon", "pm"]
+RUN_TYPES = ["workout", "easy"]
+
+# Entry ids by date, kept current from store changes, so a flush finds the
+# day's entry without scanning the log
+day_entries = {}
+
+# Waiting pushes: list of (pushes, future) per request
+pending = []
+pending_count = 0
+batch_ready = None
+flusher = None
+closing = False
+
+# Totals reported by the simulator
+stats = {"pushes": 0, "flushes": 0, "records": 0}
+
+
+# =============================================================================
+# DAY INDEX
+# =============================================================================
+
+def on_store_change(op, old, new):
+    """Keep day_entries in step with the store"""
+    if op == "reset":
+        day_entries.clear()
+        for entry in store.cache["entries"].values():
+            day_entries.setdefault(entry["date"], []).append(entry["id"])
+        return
+
+    if old is not None:
+        day_entries[old["date"]].remove(old["id"])
+        if not day_entries[old["date"]]:
+            del day_entries[old["date"]]
+    if new is not None:
+        day_entries.setdefault(new["date"], []).append(new["id"])
+
+
+store.subscribe(on_store_change)
+
+
+# =============================================================================
+# PUSHES
+# =============================================================================
+
+def parse_push(data):
+    """Validate one push; returns {"date", "metrics", "run"} or raises ValueError"""
+    if not isinstance(data, dict):
+        raise ValueError("push must be an object")
+
+    date = data.get("date")
+    try:
+        datetime.strptime(date, "%Y-%m-%d")
+    except (TypeError, ValueError):
+        raise ValueError("date must be YYYY-MM-DD")
+
+    metrics = {}
+    for key, kind in DEVICE_FIELDS.items():
+        if data.get(key) is not None:
+            metrics[key] = _coerce(data[key], kind, key)
+
+    run = None
+    if data.get("run") is not None:
+        if not isinstance(data["run"], dict):
+            raise ValueError("run must be an object")
+        run = {key: _coerce(data["run"][key], kind, key)
+               for key, kind in RUN_FIELDS.items() if data["run"].get(key) is not None}
+        if run.get("time") not in RUN_TIMES or run.get("type") not in RUN_TYPES:
+            raise ValueError(f"run needs time ({'/'.join(RUN_TIMES)}) and type ({'/'.join(RUN_TYPES)})")
+        if "miles" not in run:
+            raise ValueError("run needs miles")
+        # Same checks the store applies, so one bad push can't fail a batch
+        store.validate_entry(dict(new_day_entry(date), **run))
+
+    if not metrics and run is None:
+        raise ValueError("push has no metrics or run")
+    return {"date": date, "metrics": metrics, "run": run}
+
+
+def _coerce(value, kind, key):
+    if kind is str:
+        if not isinstance(value, str):
+            raise ValueError(f"{key} must be a string")
+        return value
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ValueError(f"{key} must be a number")
+    return kind(value)
+
+
+def new_day_entry(date):
+    """Entry for a day that so far only has device metrics"""
+    return {"date": date, "time": "am", "type": "rest", "miles": 0, "pace": None, "hr": None}
+
+
+def merge_pushes(pushes):
+    """Records that fold a batch of pushes into the store.
+
+    Device metrics go into the day's entry (the first one logged that day),
+    latest push wins. A run fills in a day that has no run yet; a second run
+    on the same day becomes its own entry. Runs under the store lock, so
+    day_entries and the cache reflect every other writer.
+    """
+    by_date = {}
+    for push in pushes:
+        by_date.setdefault(push["date"], []).append(push)
+
+    records = []
+    for date, day_pushes in by_date.items():
+        ids = day_entries.get(date)
+        existing = store.get_entry(ids[0]) if ids else None
+        entry = dict(existing) if existing else None
+        extra_runs = []
+
+        for push in day_pushes:
+            if entry is None:
+                entry = new_day_entry(date)
+            entry.update(push["metrics"])
+
+            run = push["run"]
+            if run is None:
+                continue
+            if entry.get("type") == "rest" and not entry.get("miles"):
+                entry.update(run)
+            else:
+                extra_runs.append(dict(new_day_entry(date), **run))
+
+        if existing is None:
+            records.append({"op": "add", "entry": entry})
+        elif entry != existing:
+            records.append({"op": "update", "entry": entry})
+        records.extend({"op": "add", "entry": run} for run in extra_runs)
+
+    return records
+
+
+# =============================================================================
+# BATCHING
+# =============================================================================
+
+def write_batch(pushes):
+    """Merge and persist a batch (runs on a worker thread)"""
+    records = store.write_batch(lambda: merge_pushes(pushes))
+    stats["flushes"] += 1
+    stats["records"] += len(records)
+    return records
+
+
+async def flush_pending():
+    """Write every waiting push as one batch and answer their requests"""
+    global pending, pending_count
+    batch, pending, pending_count = pending, [], 0
+    pushes = [push for request_pushes, _ in batch for push in request_pushes]
+
+    try:
+        await asyncio.get_running_loop().run_in_executor(None, write_batch, pushes)
+    except Exception as error:
+        for _, future in batch:
+            future.set_exception(error)
+        return
+
+    stats["pushes"] += len(pushes)
+    for request_pushes, future in batch:
+        future.set_result(len(request_pushes))
+
+
+async def flush_loop():
+    """Flush waiting pushes every FLUSH_SECONDS, or as soon as a batch fills"""
+    while True:
+        try:
+            await asyncio.wait_for(batch_ready.wait(), FLUSH_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+        batch_ready.clear()
+        if pending:
+            await flush_pending()
+        if closing:
+            return
+
+
+def start_flusher():
+    """Start the flush loop on the running event loop (once)"""
+    global flusher, batch_ready
+    if flusher is None or flusher.done():
+        batch_ready = asyncio.Event()
+        flusher = asyncio.get_running_loop().create_task(flush_loop())
+
+
+async def stop_flusher():
+    """Flush whatever is waiting, then stop the flush loop"""
+    global flusher, closing
+    if flusher is None:
+        return
+    closing = True
+    batch_ready.set()
+    await flusher
+    flusher = None
+    closing = False
+
+
+async def submit(pushes):
+    """Queue pushes for the next flush; resolves once they are saved"""
+    global pending_count
+    start_flusher()
+    future = asyncio.get_running_loop().create_future()
+    pending.append((pushes, future))
+    pending_count += len(pushes)
+    if pending_count >= BATCH_SIZE:
+        batch_ready.set()
+    return await future
+
+
+# =============================================================================
+# ASGI APP
+# =============================================================================
+
+async def send_json(send, status, body):
+    """Send a complete JSON response"""
+    data = json.dumps(body).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"),
+                    (b"content-length", str(len(data)).encode())],
+    })
+    await send({"type": "http.response.body", "body": data})
+
+
+async def read_body(receive):
+    """Read the request body, or None if it is larger than MAX_BODY"""
+    chunks = []
+    size = 0
+    while True:
+        message = await receive()
+        chunk = message.get("body", b"")
+        size += len(chunk)
+        if size > MAX_BODY:
+            return None
+        chunks.append(chunk)
+        if not message.get("more_body"):
+            return b"".join(chunks)
+
+
+async def lifespan(receive, send):
+    """Load the store on startup and flush on shutdown"""
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await asyncio.get_running_loop().run_in_executor(None, store.load_entries)
+            start_flusher()
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await stop_flusher()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    """ASGI entry point: POST /ingest"""
+    if scope["type"] == "lifespan":
+        await lifespan(receive, send)
+        return
+
+    if scope["path"] != "/ingest":
+        await send_json(send, 404, {"error": "not found"})
+        return
+    if scope["method"] != "POST":
+        await send_json(send, 405, {"error": "use POST"})
+        return
+
+    body = await read_body(receive)
+    if body is None:
+        await send_json(send, 413, {"error": f"body over {MAX_BODY} bytes"})
+        return
+
+    try:
+        data = json.loads(body)
+        pushes = [parse_push(item) for item in (data if isinstance(data, list) else [data])]
+    except ValueError as error:
+        await send_json(send, 400, {"error": str(error)})
+        return
+
+    try:
+        saved = await submit(pushes)
+    except OSError as error:
+        await send_json(send, 503, {"error": f"could not save: {error}"})
+        return
+    await send_json(send, 200, {"saved": saved})
+
+
+# =============================================================================
+# STAND-IN CLIENT
+# =============================================================================
+
+async def post(body):
+    """Call the ASGI app in-process like a server would; returns (status, json)"""
+    data = json.dumps(body).encode("utf-8")
+    scope = {"type": "http", "method": "POST", "path": "/ingest", "headers": []}
+    messages = [{"type": "http.request", "body": data, "more_body": False}]
+    response = {}
+
+    async def receive():
+        return messages.pop() if messages else {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+        else:
+            response["body"] = json.loads(message["body"])
+
+    await app(scope, receive, send)
+    return response["status"], response["body"]
+
+
+def device_pushes(days, seed):
+    """Pushes three devices would sync for `days` days ending today"""
+    rng = random.Random(seed)
+    today = datetime.now()
+    pushes = []
+    for offset in range(days):
+        date = (today - timedelta(days=days - 1 - offset)).strftime("%Y-%m-%d")
+        rhr = rng.randint(42, 52)
+        # Ring: overnight RHR/HRV
+        pushes.append({"date": date, "rhr": rhr, "hrv": rng.randint(60, 95)})
+        # Phone: HRV spot check
+        pushes.append({"date": date, "hrv": rng.randint(60, 95)})
+        # Watch: the run, with its own RHR reading
+        if rng.random() < 0.85:
+            pace = rng.randint(380, 480)
+            pushes.append({"date": date, "rhr": rhr, "run": {
+                "time": rng.choice(RUN_TIMES),
+                "type": rng.choice(RUN_TYPES),
+                "miles": round(rng.uniform(4, 14), 1),
+                "pace": f"{pace // 60}:{pace % 60:02d}",
+                "hr": rng.randint(130, 165),
+            }})
+    return pushes
+
+
+async def simulate(days, clients, seed):
+    """Replay device syncs through `clients` concurrent connections"""
+    pushes = device_pushes(days, seed)
+    random.Random(seed).shuffle(pushes)  # devices sync in no particular order
+    queue = asyncio.Queue()
+    for push in pushes:
+        queue.put_nowait(push)
+
+    statuses = {}
+
+    async def client():
+        while not queue.empty():
+            status, _ = await post(queue.get_nowait())
+            statuses[status] = statuses.get(status, 0) + 1
+
+    store.load_entries()
+    start_flusher()
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(clients)))
+    elapsed = time.perf_counter() - started
+    await stop_flusher()
+    return len(pushes), statuses, elapsed
+
+
+def run_simulation(days, clients, seed):
+    """Run the simulator against a fresh log and check every day merged"""
+    with tempfile.TemporaryDirectory() as tmp:
+        store.DATA_FILE = os.path.join(tmp, "training_data.json")
+        total, statuses, elapsed = asyncio.run(simulate(days, clients, seed))
+
+        entries = store.load_entries()
+        dates = {e["date"] for e in entries}
+        missing = [e["date"] for e in entries if e.get("rhr") is None or e.get("hrv") is None]
+
+    print(f"\n  Pushes:         {total} from {clients} clients in {elapsed:.2f}s "
+          f"({total / elapsed:.0f}/s)")
+    print(f"  Responses:      " + ", ".join(f"{n}x {s}" for s, n in sorted(statuses.items())))
+    print(f"  Flushes:        {stats['flushes']} ({stats['records']} journal records)")
+    print(f"  Entries:        {len(entries)} for {len(dates)} days (expected {days})")
+    print(f"  Missing RHR/HRV: {len(missing)}")
+    return statuses.get(200) == total and len(dates) == days and not missing
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Device ingestion endpoint for the training journal")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve = commands.add_parser("serve", help="serve the ASGI app with uvicorn")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8001)
+
+    sim = commands.add_parser("simulate", help="replay device pushes in-process")
+    sim.add_argument("--days", type=int, default=60)
+    sim.add_argument("--clients", type=int, default=32, help="concurrent connections")
+    sim.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        try:
+            import uvicorn
+        except ImportError:
+            sys.exit("uvicorn is not installed (pip install uvicorn), or run ingest:app "
+                     "under any other ASGI server")
+        uvicorn.run(app, host=args.host, port=args.port)
+    else:
+        sys.exit(0 if run_simulation(args.days, args.clients, args.seed) else 1)
+
+
+if __name__ == "__main__":
+    main()
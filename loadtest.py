@@ -0,0 +1,336 @@
+# Training Journal - Load Test
+# Drives the Flask app with concurrent requests against a synthetic log
+#
+# Usage:
+#   python loadtest.py --workers 4 --clients 16 --requests 2000 --entries 5000
+#
+# Starts app.py on a local port with --workers server processes, replays a
+# mix of dashboard/history/weekly/insights GETs and /add POSTs, then reports
+# throughput, per-route latency percentiles and whether every POSTed entry
+# made it into the store.
+#
+# Server topology: the log is loaded once, then --workers persistent
+# processes are forked. Each is a threaded server accepting on one shared
+# listening socket, so the workers keep their warm caches across requests
+# and only tail the journal. When gunicorn is installed its pre-fork
+# workers (THREADS_PER_WORKER threads each) are used instead.
+
+import argparse
+import json
+import os
+import random
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from engine import store
+
+# Request mix: (route, weight)
+ROUTE_MIX = [
+    ("GET /", 30),
+    ("GET /history", 20),
+    ("GET /weekly", 15),
+    ("GET /insights", 15),
+    ("POST /add", 20),
+]
+
+# POSTed entries get unique dates from here on, so they can be found again
+POST_START_DATE = datetime(2100, 1, 1)
+
+# Request threads per server process
+THREADS_PER_WORKER = 4
+
+
+# =============================================================================
+# SYNTHETIC DATA
+# =============================================================================
+
+def generate_entries(count, seed=0, start="2020-01-01"):
+    """Generate count plausible daily entries starting at start"""
+    rng = random.Random(seed)
+    day = datetime.strptime(start, "%Y-%m-%d")
+    entries = []
+
+    for _ in range(count):
+        run_type = rng.choice(["easy", "easy", "easy", "workout", "rest"])
+        sleep = rng.randint(2, 10)
+        alcohol = rng.random() < 0.15
+
+        entry = {
+            "date": day.strftime("%Y-%m-%d"),
+            "time": rng.choice(["am", "am", "afternoon", "pm"]),
+            "type": run_type,
+            "miles": 0,
+            "pace": None,
+            "hr": None,
+            "rhr": rng.randint(42, 50) + (3 if alcohol else 0),
+            "hrv": rng.randint(55, 95) - (8 if sleep <= 4 else 0),
+            "rpe": None,
+            "sleep": sleep,
+            "stress": rng.randint(1, 9),
+            "caffeine": rng.randint(0, 4),
+            "alcohol": alcohol,
+            "nicotine": rng.random() < 0.03,
+            "travel": rng.random() < 0.08,
+            "stretch": rng.random() < 0.5,
+            "music": rng.random() < 0.6,
+        }
+
+        if run_type != "rest":
+            pace_seconds = rng.randint(330, 390) if run_type == "workout" else rng.randint(400, 470)
+            entry["miles"] = round(rng.uniform(8, 14) if run_type == "workout" else rng.uniform(4, 10), 1)
+            entry["pace"] = f"{pace_seconds // 60}:{pace_seconds % 60:02d}"
+            entry["hr"] = rng.randint(155, 175) if run_type == "workout" else rng.randint(130, 150)
+            entry["rpe"] = min(10, max(1, (7 if run_type == "workout" else 4) + (sleep <= 4) + rng.randint(-1, 1)))
+
+        entries.append(entry)
+        # Mostly one entry per day, occasionally doubles
+        if rng.random() > 0.1:
+            day += timedelta(days=1)
+
+    return entries
+
+
+def post_form(index):
+    """Form data for the index-th POST, identified by its unique date"""
+    date = (POST_START_DATE + timedelta(days=index)).strftime("%Y-%m-%d")
+    return {
+        "date": date, "time": "am", "type": "easy", "miles": "6.2", "pace": "7:30",
+        "hr": "140", "rhr": "46", "hrv": "70", "rpe": "4", "sleep": "7", "stress": "3",
+        "caffeine": "1", "alcohol": "n", "nicotine": "n", "travel": "n", "stretch": "y", "music": "y",
+    }
+
+
+# =============================================================================
+# SERVER
+# =============================================================================
+
+def serve(data_file, port, workers):
+    """Run the app in workers persistent processes on one listening socket"""
+    import app
+
+    store.DATA_FILE = data_file
+    # Load once before forking so every worker starts from a warm cache
+    # and only tails the journal
+    app.load_data()
+
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        serve_prefork(app.app, port, workers)
+        return
+
+    class Server(BaseApplication):
+        def load_config(self):
+            self.cfg.set("bind", f"127.0.0.1:{port}")
+            self.cfg.set("workers", workers)
+            self.cfg.set("threads", THREADS_PER_WORKER)
+
+        def load(self):
+            return app.app
+
+    Server().run()
+
+
+def serve_prefork(application, port, workers):
+    """Fork workers threaded werkzeug servers sharing one listening socket"""
+    from werkzeug.serving import make_server
+
+    sock = socket.socket()
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind(("127.0.0.1", port))
+    sock.listen(128)
+
+    children = []
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            server = make_server("127.0.0.1", port, application, threaded=True, fd=sock.fileno())
+            server.serve_forever()
+            os._exit(0)
+        children.append(pid)
+
+    # Terminating the parent takes the workers down with it
+    def stop(signum, frame):
+        for pid in children:
+            os.kill(pid, signal.SIGTERM)
+
+    signal.signal(signal.SIGTERM, stop)
+    for pid in children:
+        os.waitpid(pid, 0)
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for_server(port, timeout=15):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"server did not start on port {port}")
+
+
+# =============================================================================
+# CLIENT
+# =============================================================================
+
+class NoRedirect(urllib.request.HTTPRedirectHandler):
+    """Report the 302 after /add instead of following it"""
+
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+def send(opener, base_url, route, post_index):
+    """Issue one request; returns (route, seconds, ok, post_index)"""
+    method, path = route.split(" ")
+    data = None
+    if method == "POST":
+        data = urllib.parse.urlencode(post_form(post_index)).encode()
+
+    start = time.perf_counter()
+    try:
+        with opener.open(base_url + path, data=data, timeout=60) as response:
+            response.read()
+            ok = response.status == 200
+    except urllib.error.HTTPError as e:
+        ok = method == "POST" and e.code == 302
+    except OSError:
+        ok = False
+    return route, time.perf_counter() - start, ok, post_index
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+
+def run_load(base_url, clients, total_requests, seed):
+    """Fire total_requests requests from clients threads; returns results and wall time"""
+    rng = random.Random(seed)
+    routes = [r for r, _ in ROUTE_MIX]
+    weights = [w for _, w in ROUTE_MIX]
+    plan = rng.choices(routes, weights=weights, k=total_requests)
+
+    opener = urllib.request.build_opener(NoRedirect)
+    post_index = 0
+    jobs = []
+    for route in plan:
+        if route.startswith("POST"):
+            jobs.append((route, post_index))
+            post_index += 1
+        else:
+            jobs.append((route, None))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        results = list(pool.map(lambda job: send(opener, base_url, job[0], job[1]), jobs))
+    return results, time.perf_counter() - start
+
+
+def check_persisted(data_file, results):
+    """Dates of acknowledged POSTs that are missing from (or duplicated in) the store"""
+    store.DATA_FILE = data_file
+    dates = {}
+    for entry in store.load_entries():
+        dates[entry["date"]] = dates.get(entry["date"], 0) + 1
+
+    lost = []
+    duplicated = []
+    for route, _, ok, post_index in results:
+        if post_index is None or not ok:
+            continue
+        date = post_form(post_index)["date"]
+        if date not in dates:
+            lost.append(date)
+        elif dates[date] > 1:
+            duplicated.append(date)
+    return lost, duplicated
+
+
+def report(results, elapsed, lost, duplicated):
+    print(f"\n  {len(results)} requests in {elapsed:.2f}s ({len(results) / elapsed:.1f} req/s)")
+    print(f"\n  {'Route':<16}{'count':>7}{'errors':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    print("  " + "-" * 56)
+
+    for route, _ in ROUTE_MIX:
+        times = sorted(t for r, t, _, _ in results if r == route)
+        errors = sum(1 for r, _, ok, _ in results if r == route and not ok)
+        print(f"  {route:<16}{len(times):>7}{errors:>8}"
+              f"{percentile(times, 50) * 1000:>9.1f}"
+              f"{percentile(times, 95) * 1000:>9.1f}"
+              f"{percentile(times, 99) * 1000:>9.1f}")
+
+    acknowledged = sum(1 for r, _, ok, i in results if i is not None and ok)
+    print(f"\n  POSTs acknowledged: {acknowledged}")
+    print(f"  Lost writes:        {len(lost)}")
+    print(f"  Duplicated writes:  {len(duplicated)}")
+    if lost:
+        print(f"    e.g. {', '.join(lost[:5])}")
+
+
+# =============================================================================
+# MAIN
+# =============================================================================
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the training journal web app")
+    parser.add_argument("--workers", type=int, default=4, help="server processes")
+    parser.add_argument("--clients", type=int, default=16, help="concurrent client threads")
+    parser.add_argument("--requests", type=int, default=1000, help="total requests")
+    parser.add_argument("--entries", type=int, default=2000, help="synthetic log size")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--port", type=int, default=0, help="port (default: any free port)")
+    parser.add_argument("--serve", metavar="DATA_FILE", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.port, args.workers)
+        return
+
+    port = args.port or free_port()
+    with tempfile.TemporaryDirectory() as tmp:
+        data_file = os.path.join(tmp, "training_data.json")
+        with open(data_file, "w") as f:
+            json.dump(generate_entries(args.entries, args.seed), f)
+
+        server = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), "--serve", data_file,
+             "--port", str(port), "--workers", str(args.workers)],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        try:
+            wait_for_server(port)
+            print(f"  Server on port {port}: {args.workers} pre-forked worker process(es) "
+                  f"on one socket, {args.entries} entries, {args.clients} clients")
+            results, elapsed = run_load(f"http://127.0.0.1:{port}", args.clients, args.requests, args.seed)
+        finally:
+            server.terminate()
+            server.wait()
+
+        lost, duplicated = check_persisted(data_file, results)
+        report(results, elapsed, lost, duplicated)
+
+    sys.exit(1 if lost or duplicated else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+# Training Journal - Store Tests
+# Journal writes, compaction and the caches that follow them
+#
+# Run from the repository root: python -m pytest -q
+
+import copy
+import json
+import os
+import random
+
+import pytest
+
+from engine import caches, store
+
+
+@pytest.fixture
+def log(tmp_path, monkeypatch):
+    """Empty log in a temp dir, compacted every few records"""
+    monkeypatch.setattr(store, "DATA_FILE", str(tmp_path / "training_data.json"))
+    monkeypatch.setattr(store, "COMPACT_THRESHOLD", 7)
+    store.cache["loaded"] = False
+    store.load_entries()
+    yield tmp_path
+    store.cache["loaded"] = False
+
+
+def make_entries(count, seed):
+    """Random valid entries over a few months; half-mile distances keep sums exact"""
+    rng = random.Random(seed)
+    entries = []
+    for _ in range(count):
+        run_type = rng.choice(["workout", "easy", "easy", "rest"])
+        rest = run_type == "rest"
+        entries.append({
+            "date": f"2026-{rng.randint(1, 4):02d}-{rng.randint(1, 28):02d}",
+            "time": rng.choice(["am", "afternoon", "pm"]),
+            "type": run_type,
+            "miles": 0 if rest else rng.randint(6, 28) / 2,
+            "pace": None if rest else f"{rng.randint(6, 8)}:{rng.randint(0, 59):02d}",
+            "hr": None if rest else rng.randint(130, 175),
+            "rhr": rng.choice([None, rng.randint(42, 52)]),
+            "hrv": rng.randint(50, 90),
+            "rpe": None if rest else rng.randint(1, 10),
+            "sleep": rng.randint(2, 10),
+            "stress": rng.randint(1, 9),
+            "caffeine": rng.randint(0, 4),
+            "alcohol": rng.random() < 0.2,
+            "nicotine": rng.random() < 0.05,
+            "travel": rng.random() < 0.1,
+            "stretch": rng.random() < 0.5,
+            "music": rng.random() < 0.6,
+        })
+    return entries
+
+
+def cache_state():
+    """Copy of every incrementally maintained cache"""
+    return copy.deepcopy({
+        "bitmap": caches.bitmap_index,
+        "regression": caches.regression_stats,
+        "cube": caches.report_cube,
+        "weeks": caches.week_counts,
+        "fitness": caches.fitness_index,
+    })
+
+
+def rebuild():
+    """Reload the log from disk, which resets every cache from scratch"""
+    store.cache["loaded"] = False
+    store.load_entries()
+
+
+def test_incremental_caches_match_rebuild(log):
+    rng = random.Random(1)
+    pool = make_entries(300, seed=1)
+    compactions = 0
+
+    for step in range(300):
+        ids = list(store.cache["entries"])
+        roll = rng.random()
+        if roll < 0.5 or len(ids) < 5:
+            store.add_entry(pool[step])
+        elif roll < 0.8:
+            store.update_entry(rng.choice(ids), rng.choice(pool))
+        else:
+            store.delete_entry(rng.choice(ids))
+        if store.cache["journal_records"] == 0:
+            compactions += 1
+
+    assert compactions > 10
+    assert not os.path.exists(store.DATA_FILE + ".tmp")
+    incremental = cache_state()
+    rebuild()
+    assert cache_state() == incremental
+
+
+def test_update_learns_new_metrics(log):
+    for entry in make_entries(20, seed=2):
+        entry["rhr"] = None
+        store.add_entry(entry)
+    for entry_id, entry in list(store.cache["entries"].items()):
+        store.update_entry(entry_id, dict(entry, rhr=48))
+
+    learned = {key: baseline["n"] for key, baseline in caches.anomaly_detector["baselines"].items()}
+    rebuild()
+    rebuilt = {key: baseline["n"] for key, baseline in caches.anomaly_detector["baselines"].items()}
+    assert learned == rebuilt == {"rhr": 20, "hrv": 20}
+
+
+def test_torn_journal_append(log):
+    entries = make_entries(3, seed=3)
+    store.add_entry(entries[0])
+
+    # A writer that died half-way through its append
+    with open(store.journal_file(), "ab") as f:
+        f.write(b'{"op": "add", "entry": {"date": "2020-')
+
+    rebuild()
+    assert len(store.cache["entries"]) == 1
+
+    # The next write cuts the torn bytes off and starts on its own line
+    store.add_entry(entries[1])
+    store.add_entry(entries[2])
+    with open(store.journal_file(), "rb") as f:
+        records = [json.loads(line) for line in f]
+    assert [record["entry"]["date"] for record in records] == [entry["date"] for entry in entries]
+
+    rebuild()
+    assert [entry["date"] for entry in store.load_entries()] == [entry["date"] for entry in entries]
+
+
+@pytest.mark.parametrize("field, value", [
+    ("date", "2020-02-30"),
+    ("time", "noon"),
+    ("type", "tempo"),
+    ("pace", "7:3x"),
+    ("miles", "six"),
+])
+def test_invalid_entry_is_not_written(log, field, value):
+    entry = make_entries(1, seed=4)[0]
+    with pytest.raises(ValueError):
+        store.add_entry(dict(entry, **{field: value}))
+
+    assert not os.path.exists(store.journal_file())
+    assert store.load_entries() == []
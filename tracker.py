@@ -1,11 +1,17 @@
 # Training Journal
 # A training log with correlation analysis for marathon runners
 
+import argparse
 import json
+import os
+import sys
+import tempfile
 from datetime import datetime, timedelta
 
-# File to store data
-DATA_FILE = "training_data.json"
+from engine import analytics, anomaly, caches, derived, fitness, profiling, search, store, streaming
+from engine.bitmap import BITMAP_FACTORS
+from engine.weekly import format_pace
+from loadtest import generate_entries
 
 # Your marathon goal
 GOAL = "2:32:00 Boston"
@@ -13,26 +19,25 @@ GOAL = "2:32:00 Boston"
 # All entries stored here
 entries = []
 
+# Entries per page in the history view
+HISTORY_PAGE_SIZE = 20
+
 
 # =============================================================================
 # DATA PERSISTENCE
 # =============================================================================
 
 def load_data():
-    """Load entries from file"""
-    global entries
-    try:
-        with open(DATA_FILE, "r") as f:
-            entries = json.load(f)
+    """Load entries from the store"""
+    refresh_entries()
+    if entries:
         print(f"Loaded {len(entries)} entries.")
-    except FileNotFoundError:
-        entries = []
 
 
-def save_data():
-    """Save entries to file"""
-    with open(DATA_FILE, "w") as f:
-        json.dump(entries, f, indent=2)
+def refresh_entries():
+    """Pick up changes written since the last load (only new journal records are read)"""
+    global entries
+    entries = store.load_entries()
 
 
 # =============================================================================
@@ -158,44 +163,148 @@ def add_entry():
     entry["music"] = get_input("Music (y/n): ", "yn", required=False)
 
     # Save
-    entries.append(entry)
-    save_data()
+    store.add_entry(entry)
+    refresh_entries()
 
     print("\n✓ Entry saved!")
 
 
+# =============================================================================
+# EDIT / DELETE ENTRY
+# =============================================================================
+
+# Fields that can be corrected after the fact
+# Each tuple: (key, prompt, input_type, options)
+EDIT_FIELDS = [
+    ("date", "Date (YYYY-MM-DD): ", "date", None),
+    ("time", "Time of day (am/afternoon/pm): ", "str", ["am", "afternoon", "pm"]),
+    ("type", "Type (workout/easy/rest): ", "str", ["workout", "easy", "rest"]),
+    ("miles", "Miles: ", "float", None),
+    ("pace", "Pace (M:SS): ", "pace", None),
+    ("hr", "Avg HR during run: ", "int", None),
+    ("rhr", "Resting HR: ", "int", None),
+    ("hrv", "HRV: ", "int", None),
+    ("rpe", "RPE (effort level): ", "rating", None),
+    ("sleep", "Sleep quality: ", "rating", None),
+    ("stress", "Stress level: ", "rating", None),
+    ("caffeine", "Caffeine (cups, 0 if none): ", "int", None),
+    ("alcohol", "Alcohol yesterday (y/n): ", "yn", None),
+    ("nicotine", "Nicotine yesterday (y/n): ", "yn", None),
+    ("travel", "Travel (y/n): ", "yn", None),
+    ("stretch", "Stretched (y/n): ", "yn", None),
+    ("music", "Music (y/n): ", "yn", None),
+]
+
+
+def edit_entry(entry):
+    """Correct fields of an existing entry"""
+    updated = dict(entry)
+    fields = {key: (prompt, input_type, options) for key, prompt, input_type, options in EDIT_FIELDS}
+
+    print("\n  Fields: " + ", ".join(fields))
+    while True:
+        key = input("  Field to change (Enter when done): ").strip().lower()
+        if key == "":
+            break
+        if key not in fields:
+            print("  Unknown field.")
+            continue
+        prompt, input_type, options = fields[key]
+        required = key in ("date", "time", "type")
+        updated[key] = get_input(f"  New {prompt}", input_type, required=required, options=options)
+
+    if updated["type"] == "rest":
+        updated["miles"] = 0
+        updated["pace"] = None
+        updated["hr"] = None
+
+    if updated != entry:
+        store.update_entry(entry["id"], updated)
+        refresh_entries()
+        print("\n✓ Entry updated!")
+
+
+def delete_entry(entry):
+    """Delete an entry after confirmation"""
+    if get_input(f"  Delete entry for {entry['date']}? (y/n): ", "yn"):
+        store.delete_entry(entry["id"])
+        refresh_entries()
+        print("\n✓ Entry deleted.")
+
+
 # =============================================================================
 # VIEW HISTORY
 # =============================================================================
 
+def prompt_filters():
+    """Ask for history filters; Enter skips one"""
+    print("\n  Filters (press Enter to skip any):")
+    args = {}
+    for key, prompt in [
+        ("from", "From date (YYYY-MM-DD)"),
+        ("to", "To date (YYYY-MM-DD)"),
+        ("type", "Type (workout/easy/rest)"),
+        ("time", "Time of day (am/afternoon/pm)"),
+        ("miles_min", "Min miles"),
+        ("miles_max", "Max miles"),
+        ("pace_min", "Fastest pace (M:SS)"),
+        ("pace_max", "Slowest pace (M:SS)"),
+        ("rpe_min", "Min RPE"),
+        ("rpe_max", "Max RPE"),
+        ("sleep", "Sleep (poor/good)"),
+    ] + [(key, f"{key.title()} (y/n)") for key in BITMAP_FACTORS]:
+        args[key] = input(f"  {prompt}: ").strip().lower()
+    return search.parse_filters(args)
+
+
 def view_history():
-    """View list of entries and drill into details"""
+    """Browse entries a page at a time, optionally filtered, and drill into details"""
     if not entries:
         print("\nNo entries yet.")
         return
 
-    # Sort by date (most recent first)
-    sorted_entries = sorted(entries, key=lambda x: x["date"], reverse=True)
+    filters = {}
+    page = 1
 
-    print("\n" + "=" * 40)
-    print("  RUN HISTORY")
-    print("=" * 40)
-
-    # Show list
-    for i, entry in enumerate(sorted_entries[:20], 1):  # Show last 20
-        type_str = entry["type"].upper()
-        if entry["type"] == "rest":
-            print(f"  {i}. {entry['date']} | REST")
-        else:
-            print(f"  {i}. {entry['date']} | {entry['miles']}mi | {entry['pace']} | {type_str}")
-
-    print("\n  Enter number to view details, or press Enter to go back.")
-    choice = input("  Selection: ").strip()
-
-    if choice.isdigit():
-        idx = int(choice) - 1
-        if 0 <= idx < len(sorted_entries):
-            view_single_entry(sorted_entries[idx])
+    while True:
+        with profiling.profile_scope("history search"):
+            page_entries, total = search.search(filters, page, HISTORY_PAGE_SIZE)
+        pages = max((total + HISTORY_PAGE_SIZE - 1) // HISTORY_PAGE_SIZE, 1)
+
+        print("\n" + "=" * 40)
+        print("  RUN HISTORY")
+        print("=" * 40)
+        print(f"  {total} of {len(entries)} entries" + (" (filtered)" if filters else "")
+              + (f", page {page} of {pages}" if pages > 1 else ""))
+
+        for i, entry in enumerate(page_entries, 1):
+            type_str = entry["type"].upper()
+            if entry["type"] == "rest":
+                print(f"  {i}. {entry['date']} | REST")
+            else:
+                print(f"  {i}. {entry['date']} | {entry['miles']}mi | {entry['pace']} | {type_str}")
+
+        print("\n  Number to view details, n/p for next/previous page,")
+        print("  f to filter, c to clear filters, or Enter to go back.")
+        choice = input("  Selection: ").strip().lower()
+
+        if choice == "n" and page < pages:
+            page += 1
+        elif choice == "p" and page > 1:
+            page -= 1
+        elif choice == "f":
+            filters = prompt_filters()
+            page = 1
+        elif choice == "c":
+            filters = {}
+            page = 1
+        elif choice.isdigit():
+            idx = int(choice) - 1
+            if 0 <= idx < len(page_entries):
+                view_single_entry(page_entries[idx])
+                return
+        elif not choice:
+            return
 
 
 def view_single_entry(entry):
@@ -228,22 +337,25 @@ def view_single_entry(entry):
     print(f"  Stretch:      {'Yes' if entry.get('stretch') else 'No' if entry.get('stretch') is False else '-'}")
     print(f"  Music:        {'Yes' if entry.get('music') else 'No' if entry.get('music') is False else '-'}")
 
+    flags = caches.anomaly_flags(entry["id"])
+    if flags:
+        print()
+        for line in anomaly.describe(flags):
+            print(f"  ⚠ {line}")
+
     print("-" * 40)
-    input("\n  Press Enter to go back...")
+    choice = input("\n  e to edit, d to delete, or press Enter to go back: ").strip().lower()
+
+    if choice == "e":
+        edit_entry(entry)
+    elif choice == "d":
+        delete_entry(entry)
 
 
 # =============================================================================
 # WEEKLY SUMMARY
 # =============================================================================
 
-def get_week_bounds(date_str):
-    """Get Monday and Sunday of the week containing date_str"""
-    date = datetime.strptime(date_str, "%Y-%m-%d")
-    monday = date - timedelta(days=date.weekday())
-    sunday = monday + timedelta(days=6)
-    return monday.strftime("%Y-%m-%d"), sunday.strftime("%Y-%m-%d")
-
-
 def weekly_summary():
     """Show weekly summary statistics"""
     if not entries:
@@ -251,12 +363,7 @@ def weekly_summary():
         return
 
     # Get available weeks
-    weeks = set()
-    for entry in entries:
-        monday, sunday = get_week_bounds(entry["date"])
-        weeks.add((monday, sunday))
-
-    weeks = sorted(weeks, reverse=True)
+    weeks = caches.available_weeks()
 
     print("\n" + "=" * 40)
     print("  WEEKLY SUMMARY")
@@ -281,73 +388,37 @@ def show_week_stats(week_tuple):
     """Calculate and display stats for a specific week"""
     monday, sunday = week_tuple
 
-    # Filter entries for this week
-    week_entries = [
-        e for e in entries
-        if monday <= e["date"] <= sunday
-    ]
-
-    if not week_entries:
+    with profiling.profile_scope("weekly"):
+        stats = caches.get_week_stats(monday, sunday)
+    if not stats["num_runs"] and not stats["rest_days"]:
         print("\n  No entries for this week.")
         return
 
-    # Calculate stats
-    run_entries = [e for e in week_entries if e["type"] != "rest"]
-    rest_days = len([e for e in week_entries if e["type"] == "rest"])
-
-    total_miles = sum(e["miles"] for e in week_entries)
-    num_runs = len(run_entries)
-
-    # Averages (only from entries that have the data)
-    def avg(key, entry_list=run_entries):
-        values = [e.get(key) for e in entry_list if e.get(key) is not None]
-        return sum(values) / len(values) if values else None
-
-    avg_rhr = avg("rhr", week_entries)
-    avg_hrv = avg("hrv", week_entries)
-    avg_hr = avg("hr")
-    avg_rpe = avg("rpe")
-    avg_sleep = avg("sleep", week_entries)
-    avg_stress = avg("stress", week_entries)
-
-    # Calculate average pace
-    total_seconds = 0
-    pace_count = 0
-    for e in run_entries:
-        if e.get("pace"):
-            parts = e["pace"].split(":")
-            total_seconds += int(parts[0]) * 60 + int(parts[1])
-            pace_count += 1
-    avg_pace = None
-    if pace_count > 0:
-        avg_sec = total_seconds / pace_count
-        avg_pace = f"{int(avg_sec // 60)}:{int(avg_sec % 60):02d}"
-
     # Display
     print("\n" + "-" * 40)
     print(f"  WEEK: {monday} to {sunday}")
     print("-" * 40)
 
-    print(f"\n  Total Miles:    {total_miles:.1f}")
-    print(f"  Runs:           {num_runs}")
-    print(f"  Rest Days:      {rest_days}")
+    print(f"\n  Total Miles:    {stats['total_miles']:.1f}")
+    print(f"  Runs:           {stats['num_runs']}")
+    print(f"  Rest Days:      {stats['rest_days']}")
 
-    if avg_pace:
-        print(f"\n  Avg Pace:       {avg_pace}/mile")
-    if avg_hr:
-        print(f"  Avg HR (run):   {avg_hr:.0f} bpm")
+    if stats["avg_pace"]:
+        print(f"\n  Avg Pace:       {stats['avg_pace']}/mile")
+    if stats["avg_hr"]:
+        print(f"  Avg HR (run):   {stats['avg_hr']:.0f} bpm")
 
-    if avg_rhr:
-        print(f"\n  Avg RHR:        {avg_rhr:.0f} bpm")
-    if avg_hrv:
-        print(f"  Avg HRV:        {avg_hrv:.0f}")
+    if stats["avg_rhr"]:
+        print(f"\n  Avg RHR:        {stats['avg_rhr']:.0f} bpm")
+    if stats["avg_hrv"]:
+        print(f"  Avg HRV:        {stats['avg_hrv']:.0f}")
 
-    if avg_rpe:
-        print(f"\n  Avg RPE:        {avg_rpe:.1f}/10")
-    if avg_sleep:
-        print(f"  Avg Sleep:      {avg_sleep:.1f}/10")
-    if avg_stress:
-        print(f"  Avg Stress:     {avg_stress:.1f}/10")
+    if stats["avg_rpe"]:
+        print(f"\n  Avg RPE:        {stats['avg_rpe']:.1f}/10")
+    if stats["avg_sleep"]:
+        print(f"  Avg Sleep:      {stats['avg_sleep']:.1f}/10")
+    if stats["avg_stress"]:
+        print(f"  Avg Stress:     {stats['avg_stress']:.1f}/10")
 
     print("-" * 40)
     input("\n  Press Enter to go back...")
@@ -363,154 +434,179 @@ def insights():
         print("\n  Need at least 5 entries for insights.")
         return
 
+    # Computed up front so a profile covers the analytics, not the printing
+    with profiling.profile_scope("insights"):
+        factor_impacts = analytics.analyze_factor_impact()
+        bests = caches.personal_bests()
+        sleep_lines = analytics.analyze_sleep_impact()
+        caffeine_lines = analytics.analyze_caffeine_impact()
+        lag_lines = analytics.analyze_lag_impact()
+
     print("\n" + "=" * 40)
     print("  INSIGHTS")
     print("=" * 40)
 
     # Analyze impact of boolean factors on RPE, RHR, HRV
-    factors = [
-        ("alcohol", "Alcohol"),
-        ("nicotine", "Nicotine"),
-        ("travel", "Travel"),
-        ("stretch", "Stretching"),
-        ("music", "Music"),
-    ]
-
-    metrics = [
-        ("rpe", "RPE", True),      # True = higher is worse
-        ("rhr", "RHR", True),      # True = higher is worse
-        ("hrv", "HRV", False),     # False = higher is better
-    ]
-
     print("\n  Factor Impact Analysis:")
     print("  " + "-" * 36)
 
-    for factor_key, factor_name in factors:
-        impacts = []
-
-        for metric_key, metric_name, higher_is_worse in metrics:
-            impact = calculate_impact(factor_key, metric_key, higher_is_worse)
-            if impact:
-                impacts.append(f"{metric_name}: {impact}")
+    for factor_name, impacts in factor_impacts:
+        print(f"\n  {factor_name}:")
+        for metric_name, impact in impacts:
+            print(f"    • {metric_name}: {impact}")
 
-        if impacts:
-            print(f"\n  {factor_name}:")
-            for impact in impacts:
-                print(f"    • {impact}")
+    # Best efforts per distance
+    if bests:
+        print("\n  " + "-" * 36)
+        print("\n  Personal Bests:")
+        for label, pace, miles, _ in bests:
+            print(f"    • {label}: {format_pace(pace)}/mi over {miles} mi")
 
     # Sleep quality correlation
     print("\n  " + "-" * 36)
     print("\n  Sleep Quality Impact:")
-    sleep_impact = analyze_sleep_impact()
-    if sleep_impact:
-        for line in sleep_impact:
-            print(f"    • {line}")
+    for line in sleep_lines:
+        print(f"    • {line}")
 
     # Caffeine analysis
     print("\n  " + "-" * 36)
     print("\n  Caffeine Impact:")
-    caffeine_impact = analyze_caffeine_impact()
-    if caffeine_impact:
-        for line in caffeine_impact:
-            print(f"    • {line}")
+    for line in caffeine_lines:
+        print(f"    • {line}")
+
+    # Delayed effects (factor on day N vs metric on day N+lag)
+    print("\n  " + "-" * 36)
+    print("\n  Delayed Effects (0-7 days):")
+    for line in lag_lines:
+        print(f"    • {line}")
 
     print("\n" + "=" * 40)
     input("\n  Press Enter to go back...")
 
 
-def calculate_impact(factor_key, metric_key, higher_is_worse):
-    """Calculate impact of a boolean factor on a metric"""
-    # Split entries by factor
-    with_factor = [e for e in entries if e.get(factor_key) is True and e.get(metric_key) is not None]
-    without_factor = [e for e in entries if e.get(factor_key) is False and e.get(metric_key) is not None]
-
-    if len(with_factor) < 2 or len(without_factor) < 2:
-        return None
-
-    avg_with = sum(e[metric_key] for e in with_factor) / len(with_factor)
-    avg_without = sum(e[metric_key] for e in without_factor) / len(without_factor)
-
-    diff = avg_with - avg_without
-
-    # Determine impact direction and magnitude
-    if higher_is_worse:
-        if diff > 0.5:
-            direction = "negative"
-        elif diff < -0.5:
-            direction = "positive"
-        else:
-            return "no significant impact"
-    else:
-        if diff > 0.5:
-            direction = "positive"
-        elif diff < -0.5:
-            direction = "negative"
-        else:
-            return "no significant impact"
-
-    magnitude = abs(diff)
-    if magnitude > 2:
-        strength = "strong"
-    elif magnitude > 1:
-        strength = "moderate"
-    else:
-        strength = "minor"
-
-    return f"{strength} {direction} impact ({avg_with:.1f} vs {avg_without:.1f})"
-
-
-def analyze_sleep_impact():
-    """Analyze how sleep quality affects metrics"""
-    results = []
-
-    # Compare good sleep (7-10) vs poor sleep (1-4)
-    good_sleep = [e for e in entries if e.get("sleep") and e["sleep"] >= 7]
-    poor_sleep = [e for e in entries if e.get("sleep") and e["sleep"] <= 4]
-
-    if len(good_sleep) < 2 or len(poor_sleep) < 2:
-        return ["Not enough data (need entries with varied sleep quality)"]
-
-    for metric_key, metric_name in [("rpe", "RPE"), ("rhr", "RHR"), ("hrv", "HRV")]:
-        good_vals = [e[metric_key] for e in good_sleep if e.get(metric_key)]
-        poor_vals = [e[metric_key] for e in poor_sleep if e.get(metric_key)]
-
-        if good_vals and poor_vals:
-            good_avg = sum(good_vals) / len(good_vals)
-            poor_avg = sum(poor_vals) / len(poor_vals)
-            diff = poor_avg - good_avg
-
-            if abs(diff) > 0.5:
-                direction = "higher" if diff > 0 else "lower"
-                results.append(f"{metric_name}: {direction} with poor sleep ({poor_avg:.1f} vs {good_avg:.1f})")
-
-    return results if results else ["No significant correlations found"]
+# =============================================================================
+# STREAMING REPORT
+# =============================================================================
 
+def stream_report(paths):
+    """Summarize logs in one streaming pass, without loading them into memory"""
+    for path in paths or [store.DATA_FILE]:
+        weeks, impacts, regressions = streaming.run_aggregators(
+            store.iter_entries(path),
+            [
+                streaming.weekly_stats_aggregator(),
+                streaming.factor_impact_aggregator(),
+                streaming.regression_sums_aggregator(),
+            ],
+        )
+
+        print("\n" + "=" * 40)
+        print(f"  REPORT: {path}")
+        print("=" * 40)
+
+        print(f"\n  Weekly Summary ({len(weeks)} weeks):")
+        for week in weeks:
+            line = f"  {week['monday']} | {week['total_miles']:6.1f}mi | {week['num_runs']} runs"
+            if week["avg_pace"]:
+                line += f" | {week['avg_pace']}"
+            if week["avg_rhr"]:
+                line += f" | RHR {week['avg_rhr']:.0f}"
+            if week["avg_rpe"]:
+                line += f" | RPE {week['avg_rpe']:.1f}"
+            print(line)
+
+        print("\n  Factor Impact Analysis:")
+        for factor_key, factor_name in analytics.IMPACT_FACTORS:
+            lines = []
+            for metric_key, metric_name, higher_is_worse in analytics.IMPACT_METRICS:
+                if (factor_key, metric_key) in impacts:
+                    avg_with, avg_without = impacts[(factor_key, metric_key)]
+                    lines.append(f"{metric_name}: {analytics.describe_impact(avg_with, avg_without, higher_is_worse)}")
+            if lines:
+                print(f"\n  {factor_name}:")
+                for line in lines:
+                    print(f"    • {line}")
+
+        print("\n  Correlation with RPE:")
+        for factor_key, result in sorted(regressions.items(), key=lambda item: -item[1]["r_squared"]):
+            print(f"    • {factor_key}: r={result['correlation']:+.2f} (n={result['n']})")
 
-def analyze_caffeine_impact():
-    """Analyze caffeine consumption impact"""
-    results = []
 
-    # Compare no caffeine vs caffeine
-    no_caffeine = [e for e in entries if e.get("caffeine") == 0 or e.get("caffeine") is None]
-    with_caffeine = [e for e in entries if e.get("caffeine") and e["caffeine"] > 0]
+# =============================================================================
+# RECOMPUTE JOB
+# =============================================================================
 
-    if len(no_caffeine) < 2 or len(with_caffeine) < 2:
-        return ["Not enough data (need entries with varied caffeine intake)"]
+def recompute(args):
+    """Rebuild the derived tables for all history in parallel chunks"""
+    parser = argparse.ArgumentParser(prog="tracker.py recompute",
+                                     description="Recompute derived tables (weekly totals, regression sums, report cube)")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: one per CPU)")
+    parser.add_argument("--chunk-weeks", type=int, default=derived.CHUNK_WEEKS, help="weeks per chunk")
+    options = parser.parse_args(args)
 
-    for metric_key, metric_name in [("rpe", "RPE"), ("rhr", "RHR")]:
-        no_caff_vals = [e[metric_key] for e in no_caffeine if e.get(metric_key)]
-        with_caff_vals = [e[metric_key] for e in with_caffeine if e.get(metric_key)]
+    print("\n" + "=" * 40)
+    print(f"  RECOMPUTE: {store.DATA_FILE}")
+    print("=" * 40)
+    try:
+        computed = derived.recompute(options.workers, options.chunk_weeks)
+    except KeyboardInterrupt:
+        print("\n  Interrupted. Finished chunks are saved; run again to resume.")
+        sys.exit(130)
+    print(f"\n✓ {computed} chunks computed, tables swapped into {derived.derived_file()}")
 
-        if no_caff_vals and with_caff_vals:
-            no_avg = sum(no_caff_vals) / len(no_caff_vals)
-            with_avg = sum(with_caff_vals) / len(with_caff_vals)
-            diff = with_avg - no_avg
 
-            if abs(diff) > 0.5:
-                direction = "higher" if diff > 0 else "lower"
-                results.append(f"{metric_name}: {direction} with caffeine ({with_avg:.1f} vs {no_avg:.1f})")
+# =============================================================================
+# BENCHMARK
+# =============================================================================
 
-    return results if results else ["No significant impact detected"]
+# History searches replayed by the benchmark
+BENCHMARK_SEARCHES = [
+    {},
+    {"type": "workout", "pace_max": "6:00", "sleep": "poor"},
+    {"miles_min": "8", "rpe_min": "6", "travel": "n"},
+    {"time": "pm", "alcohol": "y"},
+]
+
+
+def benchmark(args):
+    """Profile the analytics paths against a synthetic log"""
+    parser = argparse.ArgumentParser(prog="tracker.py benchmark",
+                                     description="Profile analytics against a synthetic log from loadtest.py")
+    parser.add_argument("--entries", type=int, default=2000, help="synthetic log size")
+    parser.add_argument("--seed", type=int, default=0)
+    options = parser.parse_args(args)
+
+    # Same seed, same log: reports from two runs line up
+    start = (datetime.now() - timedelta(days=options.entries - 1)).strftime("%Y-%m-%d")
+    profiling.enable()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        store.DATA_FILE = os.path.join(tmp_dir, "benchmark.json")
+        with open(store.DATA_FILE, "w") as f:
+            json.dump(generate_entries(options.entries, options.seed, start), f)
+
+        with profiling.profile_scope(f"load {options.entries} entries"):
+            load_data()
+
+        with profiling.profile_scope("insights"):
+            analytics.generate_regression_insight(entries)
+            analytics.generate_multivariate_insight()
+            analytics.analyze_factor_impact()
+            analytics.analyze_sleep_impact()
+            analytics.analyze_caffeine_impact()
+            analytics.analyze_lag_impact()
+            caches.personal_bests()
+            caches.predict_marathon(GOAL)
+
+        with profiling.profile_scope("weekly"):
+            caches.weekly_rollups.clear()
+            for monday, sunday in caches.available_weeks():
+                caches.get_week_stats(monday, sunday)
+
+        with profiling.profile_scope("history search"):
+            for search_args in BENCHMARK_SEARCHES:
+                for page in (1, 2):
+                    search.search(search.parse_filters(search_args), page)
 
 
 # =============================================================================
@@ -522,6 +618,9 @@ def show_menu():
     print("\n" + "=" * 40)
     print("  TRAINING JOURNAL")
     print(f"  Goal: {GOAL}")
+    prediction = fitness.describe_prediction(caches.predict_marathon(GOAL))
+    if prediction:
+        print(f"  Predicted: {prediction}")
     print(f"  Entries: {len(entries)}")
     print("=" * 40)
     print("\n  1. Add entry")
@@ -540,6 +639,10 @@ def main():
         show_menu()
         choice = input("  Select option: ").strip()
 
+        if choice == "5":
+            print("\n  Good luck with your training!")
+            break
+
         if choice == "1":
             add_entry()
         elif choice == "2":
@@ -548,13 +651,29 @@ def main():
             weekly_summary()
         elif choice == "4":
             insights()
-        elif choice == "5":
-            print("\n  Good luck with your training!")
-            break
         else:
             print("\n  Please enter 1-5.")
 
 
 # Run the program
+# python tracker.py                   interactive menu
+# python tracker.py report [FILE...]  streaming summary of one or more logs
+# python tracker.py recompute         rebuild derived tables (--workers N)
+# python tracker.py benchmark         profile analytics on a synthetic log
+# Add --profile (or set TRAINING_PROFILE=1) for a report per analytics call
 if __name__ == "__main__":
-    main()
+    args = sys.argv[1:]
+    if "--profile" in args:
+        args.remove("--profile")
+        profiling.enable()
+
+    if args[:1] == ["report"]:
+        with profiling.profile_scope("report"):
+            stream_report(args[1:])
+    elif args[:1] == ["recompute"]:
+        with profiling.profile_scope("recompute"):
+            recompute(args[1:])
+    elif args[:1] == ["benchmark"]:
+        benchmark(args[1:])
+    else:
+        main()